@@ -29,7 +29,7 @@ fi
 echo -e "${YELLOW}[2/7] Installing Python dependencies...${NC}"
 sudo apt-get update
 sudo apt-get install -y python3-pip python3-dev libzbar0
-pip3 install opencv-contrib-python-headless pyzbar scikit-image --break-system-packages
+pip3 install opencv-contrib-python-headless pyzbar --break-system-packages
 echo -e "${GREEN}✓ Python dependencies installed${NC}"
 
 # Step 3: Clone repository
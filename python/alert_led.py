@@ -4,15 +4,18 @@ Alert LED Controller - Flashing Red Light for System Alerts
 Uses WS2812B addressable LED strip to show red flashing alerts
 """
 
+import os
 import sys
 import argparse
 import json
-import time
-import threading
+import asyncio
 import signal
+from typing import Optional
+
+from ws281x_buffer import map_led_buffer
 
 try:
-    from rpi_ws281x import PixelStrip, Color
+    from rpi_ws281x import PixelStrip
     WS2812_AVAILABLE = True
 except ImportError:
     WS2812_AVAILABLE = False
@@ -20,6 +23,10 @@ except ImportError:
 
 class AlertLED:
     """Controller for flashing alert LED using WS2812B strip"""
+
+    # Packed 0x00RRGGBB values as stored in the ws2811 LED buffer
+    RED = 0xFF0000
+    OFF = 0x000000
     
     def __init__(self, pin: int, num_leds: int = 27):
         """
@@ -31,9 +38,10 @@ class AlertLED:
         """
         self.pin = pin
         self.num_leds = num_leds
-        self.flashing = False
-        self.flash_thread = None
+        self._task = None
+        self._stop = asyncio.Event()
         self.strip = None
+        self._led_buf = None
         
         if WS2812_AVAILABLE:
             try:
@@ -51,32 +59,65 @@ class AlertLED:
             except Exception as e:
                 print(f"Error initializing LED strip: {e}", file=sys.stderr)
                 self.strip = None
-    
-    def _set_all_color(self, r: int, g: int, b: int):
-        """Set all LEDs to a specific color"""
+
+        if self.strip:
+            self._led_buf = map_led_buffer(self.strip, self.num_leds)
+
+    def _fill(self, packed: int):
+        """Set every LED to a packed 0x00RRGGBB color and push it to the strip"""
         if not self.strip:
             return False
         try:
-            for i in range(self.num_leds):
-                self.strip.setPixelColor(i, Color(r, g, b))
+            if self._led_buf is not None:
+                self._led_buf[:] = packed
+            else:
+                for i in range(self.num_leds):
+                    self.strip.setPixelColor(i, packed)
             self.strip.show()
             return True
         except Exception as e:
             print(f"Error setting LED color: {e}", file=sys.stderr)
             return False
+
+    def _set_all_color(self, r: int, g: int, b: int):
+        """Set all LEDs to a specific color"""
+        return self._fill((r << 16) | (g << 8) | b)
+    
+    async def _wait_for_stop(self, timeout: float) -> bool:
+        """Wait up to timeout seconds; True as soon as a stop is requested"""
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+    
+    async def _flash_loop(self, on_time: float, off_time: float):
+        """Toggle the strip RED/OFF until a stop is requested"""
+        try:
+            while True:
+                # Turn RED
+                self._fill(self.RED)
+                if await self._wait_for_stop(on_time):
+                    break
+                
+                # Turn OFF
+                self._fill(self.OFF)
+                if await self._wait_for_stop(off_time):
+                    break
+        finally:
+            # Guarantee the strip is dark however the loop ends
+            self._fill(self.OFF)
     
     def start_flash(self, pattern: str = "fast"):
         """
-        Start flashing the LED strip RED
+        Start flashing the LED strip RED (must be called from a running event loop)
         
         Args:
             pattern: Flash pattern - "fast" (0.25s), "slow" (1s), "pulse" (variable)
         """
-        if self.flashing:
+        if self.is_flashing():
             return True
         
-        self.flashing = True
-        
         if pattern == "fast":
             on_time = 0.25
             off_time = 0.25
@@ -90,28 +131,25 @@ class AlertLED:
             on_time = 0.5
             off_time = 0.5
         
-        def flash_loop():
-            while self.flashing:
-                # Turn RED
-                self._set_all_color(255, 0, 0)
-                time.sleep(on_time)
-                
-                if not self.flashing:
-                    break
-                
-                # Turn OFF
-                self._set_all_color(0, 0, 0)
-                time.sleep(off_time)
-        
-        self.flash_thread = threading.Thread(target=flash_loop)
-        self.flash_thread.start()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._flash_loop(on_time, off_time))
         return True
     
-    def stop_flash(self):
+    def request_stop(self):
+        """Ask the flash loop to stop; safe to use directly as a signal handler"""
+        self._stop.set()
+    
+    async def wait_flash(self, timeout: Optional[float] = None):
+        """Wait until the flash loop ends (or timeout seconds elapse)"""
+        if self._task is not None:
+            await asyncio.wait({self._task}, timeout=timeout)
+    
+    async def stop_flash(self):
         """Stop flashing and turn off LED strip"""
-        self.flashing = False
-        if self.flash_thread:
-            self.flash_thread.join(timeout=2)
+        self.request_stop()
+        if self._task is not None:
+            await self._task
+            self._task = None
         
         # Turn off all LEDs
         self._set_all_color(0, 0, 0)
@@ -120,11 +158,11 @@ class AlertLED:
     
     def is_flashing(self):
         """Check if LED is currently flashing"""
-        return self.flashing
+        return self._task is not None and not self._task.done()
     
-    def set_state(self, state: bool):
+    async def set_state(self, state: bool):
         """Set LED strip to constant RED (on) or OFF"""
-        self.stop_flash()
+        await self.stop_flash()
         
         if state:
             self._set_all_color(255, 0, 0)  # RED for alerts
@@ -134,33 +172,38 @@ class AlertLED:
         return True
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Alert LED Controller - WS2812B RGB LED Strip")
-    parser.add_argument("--pin", type=int, required=True, help="GPIO pin number (BCM) - should be 18 for WS2812B")
-    parser.add_argument("--action", choices=["flash", "stop", "on", "off", "status"], required=True, help="Action to perform")
-    parser.add_argument("--pattern", choices=["fast", "slow", "pulse"], default="fast", help="Flash pattern (for flash action)")
-    parser.add_argument("--duration", type=int, help="Flash duration in seconds (optional)")
-    parser.add_argument("--num-leds", type=int, default=27, help="Number of LEDs in the strip (default 27)")
-    
-    args = parser.parse_args()
+def _raise_priority(priority: int = 20):
+    """
+    Run this process under SCHED_FIFO so flash toggles wake on time
     
+    The flash loop runs on the main thread's event loop, so the whole process
+    is elevated. Without CAP_SYS_NICE (or off Linux) it stays at the default
+    policy.
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        return True
+    except (PermissionError, OSError, AttributeError) as e:
+        print(f"WARNING: could not set SCHED_FIFO priority: {e}", file=sys.stderr)
+        return False
+
+
+async def _amain(args) -> int:
     led = AlertLED(args.pin, args.num_leds)
     
-    # Setup signal handler for graceful shutdown
-    def signal_handler(sig, frame):
-        led.stop_flash()
-        sys.exit(0)
-    
-    signal.signal(signal.SIGTERM, signal_handler)
-    signal.signal(signal.SIGINT, signal_handler)
+    # Signal handlers only raise the stop flag; the flash loop does the cleanup
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, led.request_stop)
+    loop.add_signal_handler(signal.SIGINT, led.request_stop)
     
     if args.action == "flash":
+        _raise_priority()
         success = led.start_flash(args.pattern)
         
         # If duration specified, flash for that long then stop
         if args.duration:
-            time.sleep(args.duration)
-            led.stop_flash()
+            await led.wait_flash(args.duration)
+            await led.stop_flash()
             result = {
                 "success": success,
                 "pin": args.pin,
@@ -179,17 +222,15 @@ def main():
             }
             print(json.dumps(result), flush=True)
             
-            # Keep process alive by joining the thread
-            # This blocks until the thread is signaled to stop
-            if led.flash_thread:
-                led.flash_thread.join()
+            # Keep process alive until SIGTERM/SIGINT stops the flash loop
+            await led.wait_flash()
             
             # Clean up on exit
-            led.stop_flash()
+            await led.stop_flash()
             return 0
     
     elif args.action == "stop":
-        success = led.stop_flash()
+        success = await led.stop_flash()
         result = {
             "success": success,
             "pin": args.pin,
@@ -198,7 +239,7 @@ def main():
         }
     
     elif args.action == "on":
-        success = led.set_state(True)
+        success = await led.set_state(True)
         result = {
             "success": success,
             "pin": args.pin,
@@ -207,7 +248,7 @@ def main():
         }
     
     elif args.action == "off":
-        success = led.set_state(False)
+        success = await led.set_state(False)
         result = {
             "success": success,
             "pin": args.pin,
@@ -227,5 +268,18 @@ def main():
     return 0 if result.get("success", False) else 1
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Alert LED Controller - WS2812B RGB LED Strip")
+    parser.add_argument("--pin", type=int, required=True, help="GPIO pin number (BCM) - should be 18 for WS2812B")
+    parser.add_argument("--action", choices=["flash", "stop", "on", "off", "status"], required=True, help="Action to perform")
+    parser.add_argument("--pattern", choices=["fast", "slow", "pulse"], default="fast", help="Flash pattern (for flash action)")
+    parser.add_argument("--duration", type=int, help="Flash duration in seconds (optional)")
+    parser.add_argument("--num-leds", type=int, default=27, help="Number of LEDs in the strip (default 27)")
+    
+    args = parser.parse_args()
+    
+    return asyncio.run(_amain(args))
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -4,73 +4,286 @@ ArUco 4-Corner Calibration Module for Tool Tracking System
 Detects 4 corner ArUco markers (IDs 17-20) and computes homography matrix
 """
 
+from __future__ import annotations
+
 import argparse
 import json
+import os
 import sys
 import base64
 import logging
 from typing import Optional, Tuple, Dict
-import numpy as np
-import cv2
-from rectified_preview import generate_rectified_image_from_frame
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Default paper (A4 landscape) and corner marker geometry, in cm
+A4_PAPER_SIZE_CM = (29.7, 21.0)
+MARKER_SIZE_CM = 5.0
+# Markers sit flush in the paper corners, so their centers are half a marker in
+MARKER_CENTER_OFFSET_CM = MARKER_SIZE_CM / 2.0
+
+# cv2/numpy take hundreds of milliseconds to import on a Pi, so they are loaded
+# on first use rather than before argument parsing (--help and bad args stay cheap)
+cv2 = None
+np = None
+
+def _import_cv():
+    """Import cv2 and numpy into module globals on first use"""
+    global cv2, np
+    if cv2 is None:
+        import numpy
+        import cv2 as _cv2
+        np = numpy
+        cv2 = _cv2
+
+class CameraSession:
+    """
+    Open camera capture that can be reused across calibrations
+    
+    Opening a V4L2 device and negotiating MJPG/resolution costs hundreds of
+    milliseconds, so daemon mode keeps one session alive between requests.
+    """
+    
+    def __init__(self, source, width: int, height: int):
+        """
+        Open and configure the camera
+        
+        Args:
+            source: Camera device index or device path (/dev/video0, etc.)
+            width: Requested frame width
+            height: Requested frame height
+        """
+        _import_cv()
+        self.source = source
+        self.resolution = (width, height)
+        
+        logger.info(f"Opening camera: {source}")
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise Exception(f"Could not open camera {source}")
+        
+        # Set MJPG format for better performance with USB cameras
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        # Keep the driver queue short (only honored by some backends)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    
+    def matches(self, source, width: int, height: int) -> bool:
+        """Check whether this session is open on the given source and resolution"""
+        return self.cap.isOpened() and self.source == source and self.resolution == (width, height)
+    
+    def read(self, discard: int = 4) -> np.ndarray:
+        """
+        Capture a fresh frame
+        
+        Args:
+            discard: Number of buffered frames to grab and drop first; USB MJPG
+                cameras queue several frames, and the first ones after a format
+                change are often stale or blurry
+        """
+        for _ in range(discard):
+            self.cap.grab()  # decode-free, unlike read()
+        ret, frame = self.cap.read()
+        if not ret:
+            raise Exception("Failed to capture frame from camera")
+        return frame
+    
+    def release(self):
+        """Release the camera device"""
+        self.cap.release()
+
+# Open camera sessions keyed by (source, width, height), reused across daemon requests
+_SESSION_POOL: Dict[Tuple, CameraSession] = {}
+
+def get_session(source, width: int, height: int) -> CameraSession:
+    """
+    Get a pooled camera session, opening it on first use
+    
+    A device can only be open at one resolution, so any pooled session on the
+    same source with a different resolution is released first.
+    """
+    key = (source, width, height)
+    session = _SESSION_POOL.get(key)
+    if session is not None and session.matches(source, width, height):
+        return session
+    
+    for other_key in [k for k in _SESSION_POOL if k[0] == source]:
+        _SESSION_POOL.pop(other_key).release()
+    
+    session = CameraSession(source, width, height)
+    _SESSION_POOL[key] = session
+    return session
+
+def close_all_sessions():
+    """Release every pooled camera session"""
+    while _SESSION_POOL:
+        _, session = _SESSION_POOL.popitem()
+        session.release()
+
 class ArucoCornerCalibrator:
-    def __init__(self, dictionary_type=cv2.aruco.DICT_4X4_100):
+    def __init__(self, dictionary_type: Optional[int] = None, intrinsics_path: Optional[str] = None):
         """
         Initialize ArUco calibrator for 4-corner detection
         
         Args:
-            dictionary_type: ArUco dictionary type (DICT_4X4_100)
+            dictionary_type: ArUco dictionary type (default DICT_4X4_100)
+            intrinsics_path: Optional .npz with measured 'camera_matrix' and 'dist_coeffs'
+                (e.g. from a checkerboard calibration); estimated per frame if omitted
         """
+        _import_cv()
+        if dictionary_type is None:
+            dictionary_type = cv2.aruco.DICT_4X4_100
+        
+        # Measured camera intrinsics, loaded once and reused for every calibration
+        self._camera_matrix = None
+        self._dist_coeffs = None
+        if intrinsics_path:
+            self._camera_matrix, self._dist_coeffs = self.load_intrinsics(intrinsics_path)
+        
         # Initialize ArUco dictionary and detector
         self.aruco_dict = cv2.aruco.getPredefinedDictionary(dictionary_type)
         self.detector_params = cv2.aruco.DetectorParameters()
+        # Only quad centers are used, so skip per-corner refinement
+        self.detector_params.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_NONE
+        # ArUco3 contour handling is cheaper than the classic pipeline (OpenCV >= 4.6)
+        if hasattr(self.detector_params, 'useAruco3Detection'):
+            self.detector_params.useAruco3Detection = True
+        # Adaptive-threshold windows 3, 13 and 23px: the best window follows the
+        # marker's pixel size (i.e. how far the paper is from the camera), so no
+        # single window works for every setup. Small contours are rejected before
+        # they are traced
+        self.detector_params.adaptiveThreshWinSizeMin = 3
+        self.detector_params.adaptiveThreshWinSizeMax = 23
+        self.detector_params.adaptiveThreshWinSizeStep = 10
+        self.detector_params.minMarkerPerimeterRate = 0.05
+        self.detector_params.polygonalApproxAccuracyRate = 0.05
+        self.detector_params.perspectiveRemovePixelPerCell = 4
+        
+        # Build the detector once (OpenCV >= 4.7); older builds use the free function
+        if hasattr(cv2.aruco, 'ArucoDetector'):
+            self.detector = cv2.aruco.ArucoDetector(self.aruco_dict, self.detector_params)
+        else:
+            self.detector = None
         
         # Expected corner marker IDs (A=17, B=18, C=19, D=20)
         self.corner_ids = [17, 18, 19, 20]
+        self._corner_ids_arr = np.array(self.corner_ids, dtype=np.int32)
+        
+        # Frames at least this wide are downscaled before marker detection
+        # (5cm corner markers remain easily detectable at half of 1080p)
+        self.detection_scale = 0.5
+        self.downscale_min_width = 1280
+        # Use the green channel as luminance instead of a weighted BGR->gray conversion
+        self.fast_gray = True
+        # Corners found on the downscaled copy are refined on the full-resolution image
+        self.subpix_win = (5, 5)
+        self.subpix_criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+        
+        # Estimated (camera_matrix, dist_coeffs) per (height, width)
+        self._intrinsics_cache: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]] = {}
+        
+        # Paper-corner source points (cm) per paper size, seeded with the A4 default
+        self._src_cache: Dict[Tuple[float, float], np.ndarray] = {}
+        self._get_src_points(A4_PAPER_SIZE_CM)
         
-    def detect_corner_markers(self, image: np.ndarray) -> Tuple[Dict[int, np.ndarray], int]:
+    def detect_corner_markers(self, image: np.ndarray) -> Tuple[np.ndarray, int, np.ndarray]:
         """
         Detect the 4 corner ArUco markers in the image
         
         Returns:
-            marker_centers: Dictionary mapping marker ID to center point (x, y)
+            dst_points: (4, 2) marker centers (x, y) in order A, B, C, D (row = id - 17),
+                NaN where a marker was not found
             num_detected: Number of corner markers detected
+            mask: (4,) bool array, True where the marker was found
         """
+        dst_points = np.full((4, 2), np.nan, dtype=np.float32)
+        no_markers = np.zeros(4, dtype=bool)
+        
+        # Validate up front instead of catching failures from deep inside the pipeline
+        if image is None or image.size == 0 or image.ndim not in (2, 3):
+            logger.error("Invalid image for corner marker detection")
+            return dst_points, 0, no_markers
+        
+        # Single-channel input: green carries the best SNR and is a plain copy
+        # instead of a weighted BGR->gray sum
+        if image.ndim == 2:
+            gray = image
+        elif self.fast_gray:
+            gray = cv2.extractChannel(image, 1)
+        else:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        
+        # Detection cost scales with pixel count, so search a downscaled copy
+        scale = self.detection_scale if gray.shape[1] >= self.downscale_min_width else 1.0
+        if scale != 1.0:
+            detect_img = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            detect_img = gray
+        
+        # Detect all markers
         try:
-            # Convert to grayscale if needed
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
-            
-            # Detect all markers
-            corners, ids, rejected = cv2.aruco.detectMarkers(
-                gray, self.aruco_dict, parameters=self.detector_params
-            )
-            
-            if ids is None or len(corners) == 0:
-                logger.warning("No markers detected")
-                return {}, 0
-            
-            # Extract center points for our corner markers
-            marker_centers = {}
-            for i, marker_id in enumerate(ids.flatten()):
-                if marker_id in self.corner_ids:
-                    # Calculate center of the marker (average of 4 corners)
-                    corner_points = corners[i][0]
-                    center_x = np.mean(corner_points[:, 0])
-                    center_y = np.mean(corner_points[:, 1])
-                    marker_centers[marker_id] = np.array([center_x, center_y], dtype=np.float32)
-            
-            num_detected = len(marker_centers)
-            logger.info(f"Detected {num_detected}/4 corner markers: {list(marker_centers.keys())}")
-            
-            return marker_centers, num_detected
-            
-        except Exception as e:
+            if self.detector is not None:
+                corners, ids, rejected = self.detector.detectMarkers(detect_img)
+            else:
+                corners, ids, rejected = cv2.aruco.detectMarkers(
+                    detect_img, self.aruco_dict, parameters=self.detector_params
+                )
+        except cv2.error as e:
             logger.error(f"Error detecting corner markers: {e}")
-            return {}, 0
+            return dst_points, 0, no_markers
+        
+        if ids is None or len(corners) == 0:
+            logger.warning("No markers detected")
+            return dst_points, 0, no_markers
+        
+        # Stack all detections as (N, 4, 2) corner arrays, keeping only our corner markers
+        ids_flat = ids.ravel()
+        keep = np.isin(ids_flat, self._corner_ids_arr)
+        ids_flat = ids_flat[keep]
+        corner_arr = np.asarray(corners, dtype=np.float32).reshape(-1, 4, 2)[keep]
+        
+        # Map corner coordinates back to full-resolution pixels and
+        # recover the precision lost to downscaling with sub-pixel refinement
+        if scale != 1.0 and len(ids_flat):
+            corner_pts = ((corner_arr + 0.5) / scale - 0.5).reshape(-1, 1, 2)
+            cv2.cornerSubPix(gray, corner_pts, self.subpix_win, (-1, -1), self.subpix_criteria)
+            corner_arr = corner_pts.reshape(-1, 4, 2)
+        
+        # Center of each marker is the average of its 4 corners,
+        # stored in its fixed slot (id - 17)
+        dst_points[ids_flat - self.corner_ids[0]] = corner_arr.mean(axis=1)
+        
+        mask = ~np.isnan(dst_points[:, 0])
+        num_detected = int(mask.sum())
+        logger.info(f"Detected {num_detected}/4 corner markers: {self._corner_ids_arr[mask].tolist()}")
+        
+        return dst_points, num_detected, mask
+    
+    @staticmethod
+    def load_intrinsics(path: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Load persisted camera intrinsics
+        
+        Args:
+            path: .npz file with 'camera_matrix' (3x3) and 'dist_coeffs' (k1, k2, p1, p2[, k3...])
+            
+        Returns:
+            camera_matrix: 3x3 float32 camera matrix
+            dist_coeffs: float32 distortion coefficients
+        """
+        with np.load(path) as data:
+            camera_matrix = np.asarray(data['camera_matrix'], dtype=np.float32).reshape(3, 3)
+            dist_coeffs = np.asarray(data['dist_coeffs'], dtype=np.float32).ravel()
+        logger.info(f"Loaded camera intrinsics from {path}")
+        return camera_matrix, dist_coeffs
     
     def estimate_camera_matrix(self, image_shape: Tuple[int, int]) -> np.ndarray:
         """
@@ -97,15 +310,54 @@ class ArucoCornerCalibrator:
         
         return camera_matrix
 
-    def calculate_homography(self, marker_centers: Dict[int, np.ndarray], 
+    def _default_intrinsics(self, image_shape: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Estimated camera matrix and zero distortion for an image size, cached per size
+        
+        Returns:
+            camera_matrix: 3x3 estimated camera matrix
+            dist_coeffs: Zero distortion coefficients (k1, k2, p1, p2, k3)
+        """
+        key = tuple(image_shape)
+        intrinsics = self._intrinsics_cache.get(key)
+        if intrinsics is None:
+            # The camera may not have significant distortion, or the homography handles it
+            intrinsics = (self.estimate_camera_matrix(key), np.zeros(5, dtype=np.float32))
+            self._intrinsics_cache[key] = intrinsics
+        return intrinsics
+
+    def _get_src_points(self, paper_size_cm: Tuple[float, float]) -> np.ndarray:
+        """
+        Marker-center source points (cm) for a paper size, cached per size
+        
+        Returns:
+            (4, 2) marker centers in order A, B, C, D
+        """
+        src_points = self._src_cache.get(paper_size_cm)
+        if src_points is None:
+            # Markers are 5cm × 5cm and positioned at paper corners (0cm from edges)
+            # So marker centers are at 2.5cm from each edge
+            paper_width_cm, paper_height_cm = paper_size_cm
+            marker_center_offset = MARKER_CENTER_OFFSET_CM
+            
+            src_points = np.array([
+                [marker_center_offset, marker_center_offset],  # A: top-left center
+                [paper_width_cm - marker_center_offset, marker_center_offset],  # B: top-right center
+                [paper_width_cm - marker_center_offset, paper_height_cm - marker_center_offset],  # C: bottom-right center
+                [marker_center_offset, paper_height_cm - marker_center_offset],  # D: bottom-left center
+            ], dtype=np.float32)
+            self._src_cache[paper_size_cm] = src_points
+        return src_points
+
+    def calculate_homography(self, dst_points: np.ndarray, 
                             image_shape: Tuple[int, int],
-                            paper_size_cm: Tuple[float, float] = (29.7, 21.0)) -> Tuple[bool, Optional[np.ndarray], float, Optional[np.ndarray], Optional[np.ndarray]]:
+                            paper_size_cm: Tuple[float, float] = A4_PAPER_SIZE_CM) -> Tuple[bool, Optional[np.ndarray], float, Optional[np.ndarray], Optional[np.ndarray]]:
         """
         Calculate homography matrix from 4 corner markers with lens distortion correction
         Maps real-world paper coordinates (cm) to camera pixels
         
         Args:
-            marker_centers: Dictionary of marker ID -> center point (pixels)
+            dst_points: (4, 2) marker centers (pixels) in order A, B, C, D, NaN if missing
             image_shape: (height, width) of the image
             paper_size_cm: (width_cm, height_cm) of the paper (default A4 landscape)
             
@@ -118,78 +370,56 @@ class ArucoCornerCalibrator:
         """
         try:
             # Verify all 4 markers are detected
-            if len(marker_centers) != 4:
-                logger.warning(f"Need all 4 markers, only found {len(marker_centers)}")
+            missing = np.isnan(dst_points[:, 0])
+            if missing.any():
+                logger.warning(f"Need all 4 markers, missing marker IDs: {self._corner_ids_arr[missing].tolist()}")
                 return False, None, float('inf'), None, None
             
-            # Check that all required IDs are present
-            missing_ids = set(self.corner_ids) - set(marker_centers.keys())
-            if missing_ids:
-                logger.warning(f"Missing marker IDs: {missing_ids}")
-                return False, None, float('inf'), None, None
-            
-            # Estimate camera intrinsic matrix
-            camera_matrix = self.estimate_camera_matrix(image_shape)
-            logger.info(f"Estimated camera matrix: {camera_matrix.tolist()}")
-            
-            # Initialize distortion coefficients to zero (no distortion correction)
-            # The camera may not have significant distortion, or the homography handles it
-            # k1, k2, p1, p2, k3
-            dist_coeffs = np.array([0.0, 0.0, 0.0, 0.0, 0.0], dtype=np.float32)
-            logger.info(f"Using zero distortion coefficients (no distortion correction): {dist_coeffs.tolist()}")
+            if self._camera_matrix is not None:
+                # Use the measured intrinsics loaded at startup
+                camera_matrix = self._camera_matrix
+                dist_coeffs = self._dist_coeffs
+            else:
+                # Estimated camera intrinsic matrix with zero distortion (no distortion correction)
+                camera_matrix, dist_coeffs = self._default_intrinsics(image_shape)
             
             # Destination points: detected marker centers in pixels (in order A, B, C, D)
             # A (17) = top-left
             # B (18) = top-right
             # C (19) = bottom-right
             # D (20) = bottom-left
-            dst_points = np.array([
-                marker_centers[17],  # A: top-left
-                marker_centers[18],  # B: top-right
-                marker_centers[19],  # C: bottom-right
-                marker_centers[20],  # D: bottom-left
-            ], dtype=np.float32)
+            dst_points = np.asarray(dst_points, dtype=np.float32)
             
             # Source points: paper corners in cm (real-world coordinates)
-            # Markers are 5cm × 5cm and positioned at paper corners (0cm from edges)
-            # So marker centers are at 2.5cm from each edge
-            paper_width_cm, paper_height_cm = paper_size_cm
-            marker_size_cm = 5.0
-            marker_center_offset = marker_size_cm / 2.0  # 2.5cm
-            
-            src_points = np.array([
-                [marker_center_offset, marker_center_offset],  # A: top-left center
-                [paper_width_cm - marker_center_offset, marker_center_offset],  # B: top-right center
-                [paper_width_cm - marker_center_offset, paper_height_cm - marker_center_offset],  # C: bottom-right center
-                [marker_center_offset, paper_height_cm - marker_center_offset],  # D: bottom-left center
-            ], dtype=np.float32)
+            src_points = self._get_src_points(paper_size_cm)
             
             # Calculate homography matrix: cm → pixels
-            homography, mask = cv2.findHomography(src_points, dst_points, cv2.RANSAC, 5.0)
-            
-            if homography is None:
-                logger.error("Failed to calculate homography")
+            # 4 correspondences determine the homography exactly, so solve it in closed form
+            try:
+                homography = cv2.getPerspectiveTransform(src_points, dst_points)
+            except cv2.error as e:
+                logger.error(f"Failed to calculate homography: {e}")
                 return False, None, float('inf'), None, None
             
             # Calculate quality (reprojection error)
             # Transform source points (cm) using homography to get predicted pixel positions
-            src_points_homogeneous = np.hstack([src_points, np.ones((4, 1))])
-            projected_points_homogeneous = homography @ src_points_homogeneous.T
-            projected_points = (projected_points_homogeneous[:2, :] / projected_points_homogeneous[2, :]).T
+            projected_points = cv2.perspectiveTransform(src_points.reshape(-1, 1, 2), homography).reshape(-1, 2)
             
             # Calculate mean reprojection error (difference between detected and predicted positions)
             point_errors = np.linalg.norm(dst_points - projected_points, axis=1)
             reprojection_error = np.mean(point_errors)
             max_error = np.max(point_errors)
             
-            logger.info(f"Homography calculated successfully (maps cm → pixels)")
-            logger.info(f"Paper size: {paper_width_cm}cm × {paper_height_cm}cm")
-            logger.info(f"Detected points: {dst_points.tolist()}")
-            logger.info(f"Projected points: {projected_points.tolist()}")
-            logger.info(f"Point-wise errors: {point_errors.tolist()}")
+            # Diagnostics are only formatted when debug logging is on
+            if logger.isEnabledFor(logging.DEBUG):
+                paper_width_cm, paper_height_cm = paper_size_cm
+                source = "loaded" if self._camera_matrix is not None else "estimated, zero distortion"
+                logger.debug(f"Camera matrix ({source}): {camera_matrix.tolist()}, dist: {dist_coeffs.tolist()}")
+                logger.debug(f"Paper size: {paper_width_cm}cm × {paper_height_cm}cm")
+                logger.debug(f"Detected points: {dst_points.tolist()}")
+                logger.debug(f"Projected points: {projected_points.tolist()}")
+                logger.debug(f"Point-wise errors: {point_errors.tolist()}")
             logger.info(f"Reprojection error: mean={reprojection_error:.4f} px, max={max_error:.4f} px")
-            logger.info(f"Note: With 4 points, homography fits perfectly (8 DOF = 8 constraints), so error is near-zero")
-            logger.info(f"Camera matrix and distortion coefficients estimated (distortion currently set to zero)")
             
             return True, homography, reprojection_error, camera_matrix, dist_coeffs
             
@@ -198,11 +428,12 @@ class ArucoCornerCalibrator:
             return False, None, float('inf'), None, None
     
     def calibrate_from_camera(self, camera_index: int, resolution: Tuple[int, int], 
-                             paper_size_cm: Tuple[float, float] = (29.7, 21.0),
+                             paper_size_cm: Tuple[float, float] = A4_PAPER_SIZE_CM,
                              device_path: Optional[str] = None,
                              generate_preview: bool = False,
                              preview_output_size: Optional[Tuple[int, int]] = None,
-                             templates: Optional[list] = None) -> Dict:
+                             templates: Optional[list] = None,
+                             session: Optional[CameraSession] = None) -> Dict:
         """
         Capture frame from camera and calculate homography
         
@@ -214,51 +445,43 @@ class ArucoCornerCalibrator:
             generate_preview: Whether to generate rectified preview from calibration frame
             preview_output_size: (width, height) for rectified preview output
             templates: Template rectangles for overlay on preview
+            session: Already-open camera session to capture from (kept open afterwards)
             
         Returns:
             Dictionary with calibration results (and optional rectified preview)
         """
-        cap = None
+        owns_session = session is None
         try:
             # Initialize camera - use device path if provided, otherwise use index
-            camera_source = device_path if device_path else camera_index
-            logger.info(f"Opening camera: {camera_source}")
-            cap = cv2.VideoCapture(camera_source)
-            if not cap.isOpened():
-                raise Exception(f"Could not open camera {camera_source}")
-            
-            width, height = resolution
-            
-            # Set MJPG format for better performance with USB cameras
-            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            if owns_session:
+                camera_source = device_path if device_path else camera_index
+                width, height = resolution
+                session = CameraSession(camera_source, width, height)
             
             # Capture frame
-            ret, frame = cap.read()
-            if not ret:
-                raise Exception("Failed to capture frame from camera")
+            frame = session.read()
             
             # Detect corner markers
-            marker_centers, num_detected = self.detect_corner_markers(frame)
+            dst_points, num_detected, mask = self.detect_corner_markers(frame)
+            detected_ids = self._corner_ids_arr[mask].tolist()
             
             # Calculate homography if all markers found
             if num_detected == 4:
                 success, homography, error, camera_matrix, dist_coeffs = self.calculate_homography(
-                    marker_centers, frame.shape[:2], paper_size_cm
+                    dst_points, frame.shape[:2], paper_size_cm
                 )
                 
                 if success and homography is not None:
                     result = {
                         'ok': True,
-                        'homography_matrix': homography.flatten().tolist(),
-                        'camera_matrix': camera_matrix.flatten().tolist() if camera_matrix is not None else None,
-                        'dist_coeffs': dist_coeffs.flatten().tolist() if dist_coeffs is not None else None,
+                        'homography_matrix': homography.ravel(),
+                        'camera_matrix': camera_matrix.ravel() if camera_matrix is not None else None,
+                        'dist_coeffs': dist_coeffs.ravel() if dist_coeffs is not None else None,
                         'reprojection_error': float(error),
                         'markers_detected': num_detected,
                         'marker_positions': {
-                            f"marker_{id}": center.tolist() 
-                            for id, center in marker_centers.items()
+                            f"marker_{id}": center
+                            for id, center in zip(detected_ids, dst_points[mask])
                         }
                     }
                     
@@ -266,13 +489,15 @@ class ArucoCornerCalibrator:
                     if generate_preview and preview_output_size:
                         try:
                             logger.info("Generating rectified preview from calibration frame")
+                            from rectified_preview import generate_rectified_image_from_frame
                             rectified = generate_rectified_image_from_frame(
                                 frame, homography, preview_output_size, paper_size_cm, templates,
                                 camera_matrix, dist_coeffs
                             )
-                            # Encode as base64
-                            _, buffer = cv2.imencode('.jpg', rectified)
-                            image_base64 = base64.b64encode(buffer).decode('utf-8')
+                            # Encode as base64 (q80 is plenty for a preview and ~3x smaller than the default 95)
+                            _, buffer = cv2.imencode('.jpg', rectified, [cv2.IMWRITE_JPEG_QUALITY, 80,
+                                                                         cv2.IMWRITE_JPEG_PROGRESSIVE, 0])
+                            image_base64 = base64.b64encode(memoryview(buffer)).decode('ascii')
                             result['rectified_preview'] = f'data:image/jpeg;base64,{image_base64}'
                             logger.info("Rectified preview generated successfully")
                         except Exception as preview_err:
@@ -291,7 +516,7 @@ class ArucoCornerCalibrator:
                     'ok': False,
                     'error': f'Only detected {num_detected}/4 corner markers',
                     'markers_detected': num_detected,
-                    'detected_ids': [int(k) for k in marker_centers.keys()]
+                    'detected_ids': detected_ids
                 }
                 
         except Exception as e:
@@ -302,8 +527,86 @@ class ArucoCornerCalibrator:
                 'markers_detected': 0
             }
         finally:
-            if cap is not None:
-                cap.release()
+            if owns_session and session is not None:
+                session.release()
+
+def configure_opencv(num_threads: int):
+    """
+    Enable OpenCV optimizations and pin its worker thread count
+    
+    Detection runs on one small frame, so a full per-core pool costs more in
+    startup and contention (with the alert LED process) than it saves.
+    
+    Args:
+        num_threads: Thread count for OpenCV (and OpenMP, if cv2 is not yet imported)
+    """
+    os.environ.setdefault('OMP_NUM_THREADS', str(num_threads))
+    _import_cv()
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(num_threads)
+
+def _to_builtin(obj):
+    """json.dumps fallback for numpy arrays and scalars"""
+    return obj.tolist()
+
+def emit_json(result: Dict):
+    """
+    Write one JSON result line to stdout
+    
+    Numpy arrays in the result are serialized directly by orjson when it is
+    installed; otherwise they go through tolist() with the stdlib encoder.
+    """
+    if ORJSON_AVAILABLE:
+        sys.stdout.buffer.write(orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY) + b'\n')
+    else:
+        sys.stdout.write(json.dumps(result, default=_to_builtin) + '\n')
+    sys.stdout.flush()
+
+def parse_size(value: str, cast=int) -> Tuple:
+    """Parse a 'WxH' string into a (width, height) tuple"""
+    width, height = map(cast, value.split('x'))
+    return (width, height)
+
+def run_daemon(calibrator: ArucoCornerCalibrator):
+    """
+    Serve calibration requests as JSON lines on stdin/stdout
+    
+    Each request line uses the CLI option names, e.g.
+    {"device_path": "/dev/video0", "resolution": "1920x1080", "paper_size": "29.7x21.0",
+     "generate_preview": true, "preview_output_size": "800x600", "templates": [...]}
+    Cameras stay open between requests (one pooled session per source).
+    """
+    try:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                camera_index = int(request.get('camera', 0))
+                device_path = request.get('device_path')
+                width, height = parse_size(request.get('resolution', '1920x1080'))
+                paper_size_cm = parse_size(request.get('paper_size', '29.7x21.0'), float)
+                preview_output_size = None
+                if request.get('preview_output_size'):
+                    preview_output_size = parse_size(request['preview_output_size'])
+                
+                camera_source = device_path if device_path else camera_index
+                session = get_session(camera_source, width, height)
+                
+                result = calibrator.calibrate_from_camera(
+                    camera_index, (width, height), paper_size_cm, device_path=device_path,
+                    generate_preview=bool(request.get('generate_preview', False)),
+                    preview_output_size=preview_output_size,
+                    templates=request.get('templates'),
+                    session=session
+                )
+            except Exception as e:
+                logger.error(f"Error handling daemon request: {e}")
+                result = {'ok': False, 'error': str(e), 'markers_detected': 0}
+            
+            emit_json(result)
+    finally:
+        close_all_sessions()
 
 def main():
     parser = argparse.ArgumentParser(description='ArUco 4-Corner Calibration')
@@ -314,23 +617,29 @@ def main():
     parser.add_argument('--generate-preview', action='store_true', help='Generate rectified preview from calibration frame')
     parser.add_argument('--preview-output-size', type=str, help='Preview output size (WxH)')
     parser.add_argument('--templates', type=str, help='Template rectangles as JSON string')
+    parser.add_argument('--intrinsics', type=str, help='Camera intrinsics .npz (camera_matrix, dist_coeffs) to use instead of estimating')
+    parser.add_argument('--daemon', action='store_true', help='Serve JSON-line calibration requests on stdin, keeping the camera open')
     
     args = parser.parse_args()
     
+    # One thread for a single-shot calibration, two for the long-lived daemon
+    configure_opencv(2 if args.daemon else 1)
+    
+    if args.daemon:
+        run_daemon(ArucoCornerCalibrator(intrinsics_path=args.intrinsics))
+        sys.exit(0)
+    
     try:
         # Parse resolution
-        width, height = map(int, args.resolution.split('x'))
-        resolution = (width, height)
+        resolution = parse_size(args.resolution)
         
         # Parse paper size
-        paper_width, paper_height = map(float, args.paper_size.split('x'))
-        paper_size_cm = (paper_width, paper_height)
+        paper_size_cm = parse_size(args.paper_size, float)
         
         # Parse preview output size if provided
         preview_output_size = None
         if args.preview_output_size:
-            prev_width, prev_height = map(int, args.preview_output_size.split('x'))
-            preview_output_size = (prev_width, prev_height)
+            preview_output_size = parse_size(args.preview_output_size)
         
         # Parse templates if provided
         templates = None
@@ -338,7 +647,7 @@ def main():
             templates = json.loads(args.templates)
         
         # Initialize calibrator
-        calibrator = ArucoCornerCalibrator()
+        calibrator = ArucoCornerCalibrator(intrinsics_path=args.intrinsics)
         
         # Run calibration
         result = calibrator.calibrate_from_camera(
@@ -349,14 +658,14 @@ def main():
         )
         
         # Output JSON result
-        print(json.dumps(result))
+        emit_json(result)
         
         # Exit with appropriate code
         sys.exit(0 if result['ok'] else 1)
         
     except Exception as e:
         logger.error(f"Error in main: {e}")
-        print(json.dumps({'ok': False, 'error': str(e)}))
+        emit_json({'ok': False, 'error': str(e)})
         sys.exit(1)
 
 if __name__ == '__main__':
@@ -8,10 +8,16 @@ import argparse
 import json
 import sys
 import base64
+import functools
 from io import BytesIO
 import numpy as np
 import cv2
 
+@functools.lru_cache(maxsize=8)
+def _get_dict(dictionary_type):
+    """Predefined ArUco dictionary, built once per dictionary type"""
+    return cv2.aruco.getPredefinedDictionary(dictionary_type)
+
 def generate_aruco_marker(marker_id: int, marker_size: int = 200, dictionary_type=cv2.aruco.DICT_4X4_100):
     """
     Generate a single ArUco marker image
@@ -25,7 +31,7 @@ def generate_aruco_marker(marker_id: int, marker_size: int = 200, dictionary_typ
         Base64 encoded PNG image
     """
     try:
-        aruco_dict = cv2.aruco.getPredefinedDictionary(dictionary_type)
+        aruco_dict = _get_dict(dictionary_type)
         marker_img = cv2.aruco.generateImageMarker(aruco_dict, marker_id, marker_size)
         
         # Convert to PNG and encode as base64
@@ -43,63 +49,95 @@ def generate_aruco_marker(marker_id: int, marker_size: int = 200, dictionary_typ
 def generate_aruco_grid(markers_x: int = 6, markers_y: int = 10, 
                        marker_length_cm: float = 5.0, 
                        marker_separation_cm: float = 1.0,
-                       dictionary_type=cv2.aruco.DICT_4X4_100):
+                       dictionary_type=cv2.aruco.DICT_4X4_100,
+                       include_marker_images: bool = False,
+                       output_path: str = None):
     """
     Generate ArUco GridBoard image for printing
     
+    All markers are rendered into one canvas and encoded as a single PNG; the
+    per-marker layout (cm and pixel offsets) lets the client slice it.
+    
     Args:
         markers_x: Number of markers in x direction
         markers_y: Number of markers in y direction
         marker_length_cm: Size of each marker in cm
         marker_separation_cm: Separation between markers in cm
+        include_marker_images: Also return a separate base64 PNG per marker
+        output_path: Write the grid PNG to this file and return its path
+            instead of embedding it as base64
         
     Returns:
-        Dictionary with grid layout information and marker images
+        Dictionary with grid layout information and the grid image
     """
     try:
-        aruco_dict = cv2.aruco.getPredefinedDictionary(dictionary_type)
+        aruco_dict = _get_dict(dictionary_type)
         
         # Calculate pixels per cm (assuming 300 DPI printing: 300/2.54 ≈ 118 pixels/cm)
         pixels_per_cm = 118
         marker_size_px = int(marker_length_cm * pixels_per_cm)
         separation_px = int(marker_separation_cm * pixels_per_cm)
+        pitch_px = marker_size_px + separation_px
+        
+        # White canvas holding the whole grid
+        canvas = np.full((markers_y * pitch_px - separation_px, markers_x * pitch_px - separation_px),
+                         255, dtype=np.uint8)
         
-        # Generate markers
+        # Render markers into the canvas
         markers = []
         marker_id = 0
         
         for y in range(markers_y):
             for x in range(markers_x):
-                marker_img = cv2.aruco.generateImageMarker(aruco_dict, marker_id, marker_size_px)
+                x_px = x * pitch_px
+                y_px = y * pitch_px
+                marker_img = canvas[y_px:y_px + marker_size_px, x_px:x_px + marker_size_px]
+                cv2.aruco.generateImageMarker(aruco_dict, marker_id, marker_size_px, marker_img)
+                
+                # Calculate position in cm
+                x_pos_cm = x * (marker_length_cm + marker_separation_cm)
+                y_pos_cm = y * (marker_length_cm + marker_separation_cm)
+                
+                marker = {
+                    'id': marker_id,
+                    'x': x,
+                    'y': y,
+                    'xCm': x_pos_cm,
+                    'yCm': y_pos_cm,
+                    'sizeCm': marker_length_cm,
+                    'xPx': x_px,
+                    'yPx': y_px,
+                    'sizePx': marker_size_px
+                }
                 
-                # Encode as base64
-                success, buffer = cv2.imencode('.png', marker_img)
-                if success:
-                    png_bytes = buffer.tobytes()
-                    base64_str = base64.b64encode(png_bytes).decode('utf-8')
-                    
-                    # Calculate position in cm
-                    x_pos_cm = x * (marker_length_cm + marker_separation_cm)
-                    y_pos_cm = y * (marker_length_cm + marker_separation_cm)
-                    
-                    markers.append({
-                        'id': marker_id,
-                        'x': x,
-                        'y': y,
-                        'xCm': x_pos_cm,
-                        'yCm': y_pos_cm,
-                        'sizeCm': marker_length_cm,
-                        'image': base64_str
-                    })
-                    
+                if include_marker_images:
+                    success, buffer = cv2.imencode('.png', marker_img)
+                    if success:
+                        marker['image'] = base64.b64encode(buffer.tobytes()).decode('utf-8')
+                
+                markers.append(marker)
                 marker_id += 1
         
+        # Encode the whole grid once
+        success, buffer = cv2.imencode('.png', canvas)
+        if not success:
+            raise Exception("Failed to encode grid image")
+        
+        if output_path:
+            # Raw PNG on disk keeps the JSON small and skips the base64 pass
+            with open(output_path, 'wb') as f:
+                f.write(buffer)
+            image_fields = {'imagePath': output_path}
+        else:
+            image_fields = {'image': base64.b64encode(buffer).decode('utf-8')}
+        
         # Calculate total grid dimensions
         total_width_cm = markers_x * marker_length_cm + (markers_x - 1) * marker_separation_cm
         total_height_cm = markers_y * marker_length_cm + (markers_y - 1) * marker_separation_cm
         
         return {
             'ok': True,
+            **image_fields,
             'markers': markers,
             'gridConfig': {
                 'markersX': markers_x,
@@ -107,7 +145,8 @@ def generate_aruco_grid(markers_x: int = 6, markers_y: int = 10,
                 'markerLengthCm': marker_length_cm,
                 'markerSeparationCm': marker_separation_cm,
                 'totalWidthCm': total_width_cm,
-                'totalHeightCm': total_height_cm
+                'totalHeightCm': total_height_cm,
+                'pixelsPerCm': pixels_per_cm
             }
         }
     except Exception as e:
@@ -126,6 +165,8 @@ def main():
     parser.add_argument('--markers-y', type=int, default=10, help='Number of markers in Y direction for grid')
     parser.add_argument('--marker-length-cm', type=float, default=5.0, help='Marker size in cm')
     parser.add_argument('--marker-separation-cm', type=float, default=1.0, help='Marker separation in cm')
+    parser.add_argument('--marker-images', action='store_true', help='Also return a separate PNG per marker in grid mode')
+    parser.add_argument('--output', type=str, help='Write the grid PNG to this path instead of returning it as base64')
     
     args = parser.parse_args()
     
@@ -143,7 +184,9 @@ def main():
                 args.markers_x, 
                 args.markers_y,
                 args.marker_length_cm,
-                args.marker_separation_cm
+                args.marker_separation_cm,
+                include_marker_images=args.marker_images,
+                output_path=args.output
             )
             print(json.dumps(result))
     
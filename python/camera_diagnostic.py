@@ -9,6 +9,7 @@ import cv2
 import sys
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any
 from pathlib import Path
 
@@ -140,10 +141,12 @@ class CameraDiagnostic:
         warning_count = 0
         failed_count = 0
         
-        for camera in cameras:
-            result = self.check_camera(camera)
-            results.append(result)
-            
+        # Each check mostly blocks in V4L2 open/read, so check all cameras concurrently
+        if cameras:
+            with ThreadPoolExecutor(max_workers=len(cameras)) as executor:
+                results = list(executor.map(self.check_camera, cameras))
+        
+        for result in results:
             if result['status'] == 'healthy':
                 healthy_count += 1
             elif result['status'] == 'warning':
@@ -6,8 +6,13 @@ Handles camera capture, slot detection, and QR analysis
 
 import argparse
 import json
+import os
 import sys
 import logging
+import queue
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 import numpy as np
@@ -15,29 +20,118 @@ import cv2
 
 from qr_detector import QRDetector
 
+try:
+    from picamera2 import Picamera2
+    PICAMERA2_AVAILABLE = True
+except ImportError:
+    PICAMERA2_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# ROI snapshots are for human review, so lossy JPEG is fine and far cheaper than PNG
+ROI_JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 85, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+
+def _homography_maps(homography: np.ndarray, size: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fixed-point remap tables equivalent to warpPerspective(src, homography, size)
+    
+    With identity intrinsics and no distortion, initUndistortRectifyMap treats the
+    homography as the rectification transform, so remap() with these maps matches
+    warpPerspective but skips the per-pixel projection on every call.
+    """
+    eye = np.eye(3)
+    return cv2.initUndistortRectifyMap(eye, np.zeros(5), homography, eye, size, cv2.CV_16SC2)
+
 class CameraManager:
-    def __init__(self, camera_index: int = 0, homography_matrix: Optional[np.ndarray] = None):
+    def __init__(self, camera_index: int = 0, homography_matrix: Optional[np.ndarray] = None,
+                 use_picamera: bool = False):
         self.camera_index = camera_index
         self.homography_matrix = homography_matrix
         self.qr_detector = QRDetector()
         self.cap = None
+        self.picam = None
+        
+        # CSI cameras can be read through libcamera (mmap'd buffers) instead of V4L2
+        self.use_picamera = use_picamera and PICAMERA2_AVAILABLE
+        if use_picamera and not PICAMERA2_AVAILABLE:
+            logger.warning("picamera2 not available, falling back to OpenCV capture")
+        
+        # Gray frame buffer reused across captures (only read within one capture)
+        self._gray_buf = None
+        
+        # Full-frame rectification maps, rebuilt only when the homography or frame size changes
+        self._rectify_key = None
+        self._rectify_maps = None
+        
+        # Slot geometry cache, rebuilt only when the slot list or frame size changes
+        self._prepared_key = None
+        self._prepared_slots = []
+        
+        # ROI snapshots are encoded and written off the capture path
+        self._write_queue = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
+    
+    @staticmethod
+    def _publish_copy(path: str, alias_path: str):
+        """Atomically point alias_path at the contents of path, hardlinking when possible"""
+        # Already linked (same path rewritten within one second); rename would be a no-op
+        if os.path.exists(alias_path) and os.path.samefile(path, alias_path):
+            return
+        tmp_path = f"{alias_path}.tmp"
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(path, tmp_path)
+        except OSError:
+            # Cross-device or no hardlink support
+            shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, alias_path)
+    
+    def _writer_loop(self):
+        """Write queued (path, image, alias_path) snapshots until a None sentinel arrives"""
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                self._write_queue.task_done()
+                break
+            path, image, alias_path = item
+            try:
+                # Directories are created in _prepare_slot
+                if not cv2.imwrite(path, image, ROI_JPEG_PARAMS):
+                    logger.error(f"Failed to write {path}")
+                elif alias_path:
+                    # Encoded once; the alias shares the file instead of re-encoding
+                    self._publish_copy(path, alias_path)
+            except Exception as e:
+                logger.error(f"Error writing {path}: {e}")
+            finally:
+                self._write_queue.task_done()
+    
+    def flush_writes(self):
+        """Block until every queued ROI snapshot is on disk"""
+        self._write_queue.join()
         
     def initialize_camera(self) -> bool:
         """Initialize camera capture"""
+        if self.use_picamera:
+            return self._initialize_picamera()
         try:
             self.cap = cv2.VideoCapture(self.camera_index)
             if not self.cap.isOpened():
                 logger.error(f"Failed to open camera {self.camera_index}")
                 return False
             
-            # Set camera properties
+            # Set camera properties; MJPG before the size, since 1080p YUYV exceeds
+            # USB 2.0 bandwidth on most webcams
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
             self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
             self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
             self.cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)
+            # Keep the driver queue short (only honored by some backends)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
             
             logger.info(f"Camera {self.camera_index} initialized successfully")
             return True
@@ -45,14 +139,43 @@ class CameraManager:
             logger.error(f"Error initializing camera: {e}")
             return False
     
+    def _initialize_picamera(self) -> bool:
+        """Open CSI camera through picamera2 at the same resolution as the OpenCV path"""
+        try:
+            self.picam = Picamera2(self.camera_index)
+            # RGB888 is laid out B, G, R in memory, which is what OpenCV expects
+            config = self.picam.create_video_configuration(
+                main={"size": (1920, 1080), "format": "RGB888"}, buffer_count=2
+            )
+            self.picam.configure(config)
+            self.picam.start()
+            
+            logger.info(f"Camera {self.camera_index} initialized successfully (picamera2)")
+            return True
+        except Exception as e:
+            logger.error(f"Error initializing picamera2 camera: {e}")
+            self.picam = None
+            return False
+    
     def capture_frame(self) -> Optional[np.ndarray]:
         """Capture a single frame from camera"""
+        if self.picam is not None:
+            try:
+                # Waits for the next completed request, so there are no stale frames to drain
+                return self.picam.capture_array("main")
+            except Exception as e:
+                logger.error(f"Error capturing frame: {e}")
+                return None
+        
         if not self.cap:
             logger.error("Camera not initialized")
             return None
             
         try:
-            ret, frame = self.cap.read()
+            # Drop buffered frames older than this request; grab() skips decoding
+            for _ in range(2):
+                self.cap.grab()
+            ret, frame = self.cap.retrieve()
             if not ret:
                 logger.error("Failed to capture frame")
                 return None
@@ -69,38 +192,131 @@ class CameraManager:
             
         try:
             h, w = image.shape[:2]
-            rectified = cv2.warpPerspective(image, self.homography_matrix, (w, h))
+            key = (h, w, self.homography_matrix.tobytes())
+            if key != self._rectify_key:
+                self._rectify_maps = _homography_maps(self.homography_matrix, (w, h))
+                self._rectify_key = key
+            rectified = cv2.remap(image, *self._rectify_maps, cv2.INTER_LINEAR)
             return rectified
         except Exception as e:
             logger.error(f"Error rectifying image: {e}")
             return image
     
+    @staticmethod
+    def _slot_geometry(coords: List[List[float]], image_shape: Tuple[int, ...],
+                       homography: Optional[np.ndarray] = None) -> Dict:
+        """
+        Precompute the static crop geometry of a slot polygon
+        
+        Args:
+            coords: Slot polygon in rectified-frame pixels
+            image_shape: Shape of the frame the polygon is cut from
+            homography: Raw-to-rectified homography; when given the slot is warped
+                straight out of the raw frame instead of from a fully rectified copy
+            
+        Returns:
+            Dict with the clipped bounding box 'bbox' (x0, y0, x1, y1), the float polygon
+            'pts' for point tests, 'mask' (bbox-sized polygon mask, or None when the
+            slot is an axis-aligned rectangle and needs no mask) and
+            'warp' (None, or the raw-frame crop 'src' and its slot-local remap 'maps'),
+            and 'fused' (True when the geometry is for the raw frame)
+        """
+        pts = np.array(coords, dtype=np.int32)
+        
+        # Bounding rectangle, clipped to the image
+        x, y, w, h = cv2.boundingRect(pts)
+        img_h, img_w = image_shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, img_w), min(y + h, img_h)
+        
+        # Axis-aligned rectangles fill their bounding box: no mask needed. Otherwise the
+        # polygon is rasterized once, sized to the bbox rather than the frame
+        mask = None
+        if not (len(pts) == 4 and len(np.unique(pts[:, 0])) == 2 and len(np.unique(pts[:, 1])) == 2):
+            mask = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0)), dtype=np.uint8)
+            cv2.fillPoly(mask, [pts - (x0, y0)], 255)
+        
+        warp = None
+        if homography is not None and x1 > x0 and y1 > y0:
+            # Raw-frame region that lands inside the slot bbox, padded for interpolation
+            corners = np.array([[[x0, y0]], [[x1, y0]], [[x1, y1]], [[x0, y1]]], dtype=np.float64)
+            src = cv2.perspectiveTransform(corners, np.linalg.inv(homography)).reshape(-1, 2)
+            sx0 = max(int(np.floor(src[:, 0].min())) - 2, 0)
+            sy0 = max(int(np.floor(src[:, 1].min())) - 2, 0)
+            sx1 = min(int(np.ceil(src[:, 0].max())) + 3, img_w)
+            sy1 = min(int(np.ceil(src[:, 1].max())) + 3, img_h)
+            if sx1 > sx0 and sy1 > sy0:
+                # T_dst^-1 * H * T_src: crop pixels -> slot bbox pixels
+                t_src = np.array([[1, 0, sx0], [0, 1, sy0], [0, 0, 1]], dtype=np.float64)
+                t_dst_inv = np.array([[1, 0, -x0], [0, 1, -y0], [0, 0, 1]], dtype=np.float64)
+                warp = {
+                    'src': (sx0, sy0, sx1, sy1),
+                    'maps': _homography_maps(t_dst_inv @ homography @ t_src, (x1 - x0, y1 - y0)),
+                }
+        
+        return {
+            'bbox': (x0, y0, x1, y1),
+            'pts': pts.astype(np.float32),
+            'mask': mask,
+            'warp': warp,
+            'fused': homography is not None,
+        }
+    
+    def _prepare_slot(self, slot_config: Dict, image_shape: Tuple[int, ...],
+                      homography: Optional[np.ndarray] = None) -> Dict:
+        """Slot geometry plus its output directory, created once up front"""
+        os.makedirs(f"data/rois/{slot_config['id']}", exist_ok=True)
+        return self._slot_geometry(slot_config['coords'], image_shape, homography)
+    
+    def _prepare_slots(self, slots: List[Dict], image_shape: Tuple[int, ...],
+                       homography: Optional[np.ndarray] = None) -> List[Dict]:
+        """Per-slot geometry for this slot list, reused across captures while it is unchanged"""
+        key = (image_shape[:2], json.dumps(slots, sort_keys=True),
+               None if homography is None else homography.tobytes())
+        if key != self._prepared_key:
+            self._prepared_slots = [self._prepare_slot(slot, image_shape, homography) for slot in slots]
+            self._prepared_key = key
+        return self._prepared_slots
+    
+    @staticmethod
+    def _crop_slot(image: np.ndarray, geometry: Dict) -> np.ndarray:
+        """
+        Cut a slot out of the frame using precomputed geometry
+        
+        The frame is the raw capture when the geometry carries a warp, otherwise an
+        already rectified frame.
+        """
+        x0, y0, x1, y1 = geometry['bbox']
+        warp = geometry['warp']
+        if warp is not None:
+            sx0, sy0, sx1, sy1 = warp['src']
+            roi = cv2.remap(image[sy0:sy1, sx0:sx1], *warp['maps'], cv2.INTER_LINEAR)
+        elif geometry.get('fused'):
+            # The slot maps entirely outside the raw frame; bbox coordinates are in the
+            # rectified frame, so slicing the raw image would return unrelated pixels.
+            # Rectifying first would have left this area black
+            return np.zeros((max(y1 - y0, 0), max(x1 - x0, 0)) + image.shape[2:], image.dtype)
+        else:
+            roi = image[y0:y1, x0:x1]
+        if geometry['mask'] is None:
+            return roi
+        
+        # Apply the cached polygon mask to the ROI: a freshly allocated copyTo destination
+        # starts zeroed, and a new array per capture keeps queued writes safe
+        return cv2.copyTo(roi, geometry['mask'])
+    
     def extract_slot_roi(self, image: np.ndarray, coords: List[List[float]]) -> Optional[np.ndarray]:
         """Extract ROI for a specific slot using polygon coordinates"""
         try:
-            # Convert coordinates to numpy array
-            pts = np.array(coords, dtype=np.int32)
-            
-            # Create mask for the polygon
-            mask = np.zeros(image.shape[:2], dtype=np.uint8)
-            cv2.fillPoly(mask, [pts], 255)
-            
-            # Get bounding rectangle
-            x, y, w, h = cv2.boundingRect(pts)
-            
-            # Extract ROI
-            roi = image[y:y+h, x:x+w]
-            mask_roi = mask[y:y+h, x:x+w]
-            
-            # Apply mask to ROI
-            roi_masked = cv2.bitwise_and(roi, roi, mask=mask_roi)
-            
-            return roi_masked
+            return self._crop_slot(image, self._slot_geometry(coords, image.shape))
         except Exception as e:
             logger.error(f"Error extracting ROI: {e}")
             return None
     
-    def process_slot(self, image: np.ndarray, slot_config: Dict) -> Dict:
+    def process_slot(self, image: np.ndarray, slot_config: Dict,
+                     frame_qr_codes: Optional[List[Dict]] = None,
+                     geometry: Optional[Dict] = None,
+                     gray_image: Optional[np.ndarray] = None) -> Dict:
         """
         Process a single slot using simplified QR-based detection
         
@@ -108,9 +324,17 @@ class CameraManager:
         - Slot QR visible → EMPTY (tool missing, trigger alarm)
         - Worker QR visible → CHECKED_OUT (signed out by worker)
         - No QR visible → ITEM_PRESENT (tool covering slot QR)
+        
+        Args:
+            image: Rectified frame, or the raw frame when geometry carries a warp
+            slot_config: Slot with 'id', 'coords' and optional 'expectedQr'
+            frame_qr_codes: Located QR codes already detected on the whole frame
+                (QRDetector.detect_qr_codes_located); scans the slot ROI if omitted
+            geometry: Precomputed slot geometry from _prepare_slots; computed here if omitted
+            gray_image: Grayscale version of image, converted once per frame; the slot
+                ROI is converted on its own if omitted
         """
         slot_id = slot_config['id']
-        coords = slot_config['coords']
         slot_qr_id = slot_config.get('expectedQr')  # This is the slot's own QR ID
         
         logger.info(f"Processing slot {slot_id}")
@@ -128,29 +352,27 @@ class CameraManager:
         
         try:
             # Extract ROI
-            roi = self.extract_slot_roi(image, coords)
-            if roi is None:
-                logger.warning(f"Failed to extract ROI for slot {slot_id}")
-                result['status'] = 'ERROR'
-                return result
+            if geometry is None:
+                geometry = self._prepare_slot(slot_config, image.shape)
+            roi = self._crop_slot(image, geometry)
             
-            # Save ROI image
+            # Queue ROI image for saving (the ROI is not modified afterwards), also
+            # published as the slot's last ROI
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            roi_path = f"data/rois/{slot_id}/{timestamp}_{slot_id}.png"
-            
-            # Create directory if it doesn't exist
-            import os
-            os.makedirs(os.path.dirname(roi_path), exist_ok=True)
-            
-            cv2.imwrite(roi_path, roi)
+            roi_path = f"data/rois/{slot_id}/{timestamp}_{slot_id}.jpg"
+            last_roi_path = f"data/{slot_id}_last.jpg"
+            self._write_queue.put((roi_path, roi, last_roi_path))
             result['image_path'] = roi_path
             
-            # Also save as last ROI
-            last_roi_path = f"data/{slot_id}_last.png"
-            cv2.imwrite(last_roi_path, roi)
-            
             # QR Detection (the core of simplified logic)
-            qr_results = self.qr_detector.detect_qr_codes(roi)
+            if frame_qr_codes is not None:
+                # Codes whose center lies inside this slot's polygon
+                qr_results = [
+                    qr['data'] for qr in frame_qr_codes
+                    if cv2.pointPolygonTest(geometry['pts'], qr['center'], False) >= 0
+                ]
+            else:
+                qr_results = self.qr_detector.detect_qr_codes(roi)
             
             if qr_results:
                 qr_data = qr_results[0]  # Take first QR code found
@@ -178,13 +400,19 @@ class CameraManager:
                 result['alert_triggered'] = False
             
             # Calculate pose quality (image sharpness metric)
-            if len(roi.shape) == 3:
+            if gray_image is not None:
+                gray_roi = self._crop_slot(gray_image, geometry)
+            elif len(roi.shape) == 3:
                 gray_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
             else:
                 gray_roi = roi
             
-            # Use Laplacian variance as pose quality metric
-            laplacian_var = cv2.Laplacian(gray_roi, cv2.CV_64F).var()
+            # Use Laplacian variance as pose quality metric; the heuristic holds at half
+            # resolution, and 16-bit output is exact for 8-bit input
+            if min(gray_roi.shape[:2]) >= 32:
+                gray_roi = cv2.resize(gray_roi, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+            _, stddev = cv2.meanStdDev(cv2.Laplacian(gray_roi, cv2.CV_16S))
+            laplacian_var = float(stddev[0, 0]) ** 2
             result['pose_quality'] = min(200.0, laplacian_var)
             
         except Exception as e:
@@ -207,16 +435,51 @@ class CameraManager:
                 'slots': []
             }
         
-        # Rectify image if homography is available
-        rectified_frame = self.rectify_image(frame)
-        if rectified_frame is None:
-            rectified_frame = frame
+        # With a homography, each slot is warped straight out of the raw frame, so only
+        # slot areas are resampled instead of the whole frame
+        source_frame = frame
+        geometries = None
+        if self.homography_matrix is not None:
+            try:
+                geometries = self._prepare_slots(slots, frame.shape, self.homography_matrix)
+            except np.linalg.LinAlgError as e:
+                logger.error(f"Homography is not invertible, rectifying the full frame: {e}")
+        fused = geometries is not None
+        if not fused:
+            source_frame = self.rectify_image(frame)
+            if source_frame is None:
+                source_frame = frame
+            geometries = self._prepare_slots(slots, source_frame.shape)
+        
+        # Convert to grayscale once for both the QR scan and per-slot sharpness
+        if source_frame.ndim == 3:
+            if self._gray_buf is None or self._gray_buf.shape != source_frame.shape[:2]:
+                self._gray_buf = np.empty(source_frame.shape[:2], dtype=np.uint8)
+            gray_frame = cv2.cvtColor(source_frame, cv2.COLOR_BGR2GRAY, dst=self._gray_buf)
+        else:
+            gray_frame = source_frame
         
-        # Process each slot
+        # Scan the whole frame for QR codes once, then assign them to slots by position
+        frame_qr_codes = self.qr_detector.detect_qr_codes_located(gray_frame)
+        if fused and frame_qr_codes:
+            # Codes were found in the raw frame: move their centers to rectified coordinates
+            centers = np.array([qr['center'] for qr in frame_qr_codes], dtype=np.float64).reshape(-1, 1, 2)
+            mapped = cv2.perspectiveTransform(centers, self.homography_matrix).reshape(-1, 2)
+            for qr, (cx, cy) in zip(frame_qr_codes, mapped):
+                qr['center'] = (float(cx), float(cy))
+        logger.info(f"Found {len(frame_qr_codes)} QR codes in frame")
+        
+        # Process slots in parallel: the frame is read-only, each slot writes its own
+        # files, and OpenCV releases the GIL during the heavy work
         slot_results = []
-        for slot_config in slots:
-            result = self.process_slot(rectified_frame, slot_config)
-            slot_results.append(result)
+        if slots:
+            workers = min(len(slots), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                slot_results = list(executor.map(
+                    lambda slot_config, geometry: self.process_slot(
+                        source_frame, slot_config, frame_qr_codes, geometry, gray_frame),
+                    slots, geometries
+                ))
         
         return {
             'ok': True,
@@ -225,38 +488,87 @@ class CameraManager:
         }
     
     def cleanup(self):
-        """Clean up camera resources"""
+        """Flush pending ROI writes and clean up camera resources"""
+        self._write_queue.put(None)
+        self._writer.join()
         if self.cap:
             self.cap.release()
+        if self.picam is not None:
+            self.picam.stop()
+            self.picam.close()
         cv2.destroyAllWindows()
 
+def parse_homography(homography_data) -> Optional[np.ndarray]:
+    """Convert a flat 9-element (or 3x3) homography list to a matrix, None if empty"""
+    if not homography_data:
+        return None
+    return np.array(homography_data).reshape(3, 3)
+
+def run_daemon(camera_manager: CameraManager):
+    """
+    Serve capture requests as JSON lines on stdin/stdout with the camera kept open
+    
+    Requests:
+        {"cmd": "capture", "slots": [...], "homography": [...]}  (homography optional,
+            replaces the current one when given)
+        {"cmd": "quit"}
+    Each capture request gets one JSON line back, written once its ROI files are saved.
+    """
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            cmd = request.get('cmd', 'capture')
+            if cmd == 'quit':
+                break
+            if cmd != 'capture':
+                raise ValueError(f"Unknown command: {cmd}")
+            
+            if 'homography' in request:
+                camera_manager.homography_matrix = parse_homography(request['homography'])
+            
+            results = camera_manager.process_all_slots(request.get('slots', []))
+            camera_manager.flush_writes()
+        except Exception as e:
+            logger.error(f"Error handling daemon request: {e}")
+            results = {'ok': False, 'error': str(e)}
+        
+        print(json.dumps(results), flush=True)
+
 def main():
     parser = argparse.ArgumentParser(description='Camera Manager for Tool Tracking')
     parser.add_argument('--camera', type=int, default=0, help='Camera device index')
-    parser.add_argument('--slots', type=str, required=True, help='JSON string of slot configurations')
+    parser.add_argument('--slots', type=str, help='JSON string of slot configurations (required unless --daemon)')
     parser.add_argument('--homography', type=str, help='JSON string of homography matrix')
+    parser.add_argument('--daemon', action='store_true', help='Keep the camera open and serve JSON-line capture requests on stdin')
+    parser.add_argument('--picamera', action='store_true', help='Capture through picamera2/libcamera (Raspberry Pi CSI cameras)')
     
     args = parser.parse_args()
+    if not args.daemon and not args.slots:
+        parser.error('--slots is required unless --daemon is given')
     camera_manager = None
     
     try:
-        # Parse slot configurations
-        slots = json.loads(args.slots)
-        
         # Parse homography matrix if provided
         homography_matrix = None
         if args.homography:
-            homography_data = json.loads(args.homography)
-            if homography_data:
-                homography_matrix = np.array(homography_data).reshape(3, 3)
+            homography_matrix = parse_homography(json.loads(args.homography))
         
         # Initialize camera manager
-        camera_manager = CameraManager(args.camera, homography_matrix)
+        camera_manager = CameraManager(args.camera, homography_matrix, use_picamera=args.picamera)
         
         if not camera_manager.initialize_camera():
-            print(json.dumps({'ok': False, 'error': 'Failed to initialize camera'}))
+            print(json.dumps({'ok': False, 'error': 'Failed to initialize camera'}), flush=True)
             sys.exit(1)
         
+        if args.daemon:
+            run_daemon(camera_manager)
+            return
+        
+        # Parse slot configurations
+        slots = json.loads(args.slots)
+        
         # Process all slots
         results = camera_manager.process_all_slots(slots)
         
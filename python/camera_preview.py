@@ -8,12 +8,57 @@ import cv2
 import sys
 import json
 import base64
+import argparse
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def capture_preview(device_source, width: int = 1920, height: int = 1080):
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    # Loads libturbojpeg once per process
+    _turbo_jpeg = TurboJPEG()
+    TURBOJPEG_AVAILABLE = True
+except (ImportError, OSError):
+    TURBOJPEG_AVAILABLE = False
+
+def encode_jpeg(frame, quality: int = 85) -> bytes:
+    """Encode a BGR frame as JPEG, through libjpeg-turbo's SIMD encoder when available"""
+    if TURBOJPEG_AVAILABLE:
+        return _turbo_jpeg.encode(frame, quality=quality, pixel_format=TJPF_BGR)
+    success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        raise RuntimeError('Failed to encode frame as JPEG')
+    return buffer.tobytes()
+
+def open_camera(device_source, width: int = 1920, height: int = 1080):
+    """
+    Open and configure a camera for preview capture
+    
+    Args:
+        device_source: Camera device index (int) or device path (str like /dev/video0)
+        width: Frame width
+        height: Frame height
+        
+    Returns:
+        Opened cv2.VideoCapture, or None if the device cannot be opened
+    """
+    logger.info(f"Opening camera: {device_source}")
+    cap = cv2.VideoCapture(device_source)
+    if not cap.isOpened():
+        cap.release()
+        return None
+    
+    # Set MJPG format for better performance with USB cameras
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    
+    # Set resolution
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    return cap
+
+def capture_preview(device_source, width: int = 1920, height: int = 1080, cap=None,
+                    output_path: str = None):
     """
     Capture a single frame from camera and return as base64 JPEG
     
@@ -21,27 +66,27 @@ def capture_preview(device_source, width: int = 1920, height: int = 1080):
         device_source: Camera device index (int) or device path (str like /dev/video0)
         width: Frame width
         height: Frame height
+        cap: Already opened capture to read from (left open); a new one is opened
+            and released when omitted
+        output_path: Write the JPEG to this file and return its path instead of
+            embedding it as base64
         
     Returns:
-        JSON with base64 image data
+        JSON with base64 image data (or 'imagePath' when output_path is given)
     """
-    cap = None
+    owns_cap = cap is None
     try:
-        # Open camera
-        logger.info(f"Opening camera: {device_source}")
-        cap = cv2.VideoCapture(device_source)
-        if not cap.isOpened():
-            return {
-                'ok': False,
-                'error': f'Cannot open camera device {device_source}'
-            }
-        
-        # Set MJPG format for better performance with USB cameras
-        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
-        
-        # Set resolution
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if owns_cap:
+            cap = open_camera(device_source, width, height)
+            if cap is None:
+                return {
+                    'ok': False,
+                    'error': f'Cannot open camera device {device_source}'
+                }
+        else:
+            # A held-open camera has frames queued from before this request
+            for _ in range(2):
+                cap.grab()
         
         # Capture frame
         ret, frame = cap.read()
@@ -52,18 +97,26 @@ def capture_preview(device_source, width: int = 1920, height: int = 1080):
             }
         
         # Encode as JPEG
-        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-        
-        # Convert to base64
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
+        buffer = encode_jpeg(frame, 85)
         
-        return {
+        result = {
             'ok': True,
-            'image': f'data:image/jpeg;base64,{img_base64}',
             'width': frame.shape[1],
             'height': frame.shape[0]
         }
         
+        if output_path:
+            # Raw JPEG on disk for the web layer to serve, no base64 inflation
+            with open(output_path, 'wb') as f:
+                f.write(buffer)
+            result['imagePath'] = output_path
+        else:
+            # base64 output is pure ASCII, so skip the utf-8 decode path
+            img_base64 = base64.b64encode(buffer).decode('ascii')
+            result['image'] = f'data:image/jpeg;base64,{img_base64}'
+        
+        return result
+        
     except Exception as e:
         logger.error(f"Preview error: {e}")
         return {
@@ -71,23 +124,90 @@ def capture_preview(device_source, width: int = 1920, height: int = 1080):
             'error': str(e)
         }
     finally:
-        if cap is not None:
+        if owns_cap and cap is not None:
             cap.release()
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
+def parse_device(device_arg):
+    """Device path like /dev/video0 stays a string, anything else is a device index"""
+    device_arg = str(device_arg)
+    if device_arg.startswith('/'):
+        return device_arg
+    return int(device_arg)
+
+def run_daemon():
+    """
+    Serve preview requests as JSON lines on stdin/stdout, keeping cameras open
+    
+    Requests:
+        {"device": "/dev/video0" or 0, "width": 1920, "height": 1080, "output": path}
+            (size and output optional)
+        {"cmd": "quit"}
+    Each preview request gets one JSON line back. A camera is reopened when it is
+    requested at a different resolution or a capture from it fails.
+    """
+    cameras = {}  # device -> (capture, (width, height))
+    try:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if request.get('cmd') == 'quit':
+                    break
+                
+                device_source = parse_device(request['device'])
+                width = int(request.get('width', 1920))
+                height = int(request.get('height', 1080))
+                
+                cap, size = cameras.pop(device_source, (None, None))
+                if cap is not None and size != (width, height):
+                    cap.release()
+                    cap = None
+                if cap is None:
+                    cap = open_camera(device_source, width, height)
+                
+                if cap is None:
+                    result = {'ok': False, 'error': f'Cannot open camera device {device_source}'}
+                else:
+                    result = capture_preview(device_source, width, height, cap=cap,
+                                             output_path=request.get('output'))
+                    if result['ok']:
+                        cameras[device_source] = (cap, (width, height))
+                    else:
+                        cap.release()
+            except Exception as e:
+                logger.error(f"Error handling preview request: {e}")
+                result = {'ok': False, 'error': str(e)}
+            
+            print(json.dumps(result), flush=True)
+    finally:
+        for cap, _ in cameras.values():
+            cap.release()
+
+def main():
+    parser = argparse.ArgumentParser(description='Capture a camera preview frame as JPEG')
+    parser.add_argument('device', nargs='?', help='Device path (/dev/video0) or device index')
+    parser.add_argument('width', nargs='?', type=int, default=1920, help='Frame width')
+    parser.add_argument('height', nargs='?', type=int, default=1080, help='Frame height')
+    parser.add_argument('--output', type=str, help='Write the JPEG to this path instead of returning base64')
+    parser.add_argument('--daemon', action='store_true', help='Keep cameras open and serve JSON-line preview requests on stdin')
+    
+    args = parser.parse_args()
+    
+    if args.daemon:
+        run_daemon()
+        return 0
+    
+    if args.device is None:
         print(json.dumps({'ok': False, 'error': 'Missing device argument'}))
-        sys.exit(1)
+        return 1
     
     # Check if argument is a device path (starts with /) or device index (integer)
-    device_arg = sys.argv[1]
-    if device_arg.startswith('/'):
-        device_source = device_arg  # Device path like /dev/video0
-    else:
-        device_source = int(device_arg)  # Device index like 0, 1, 2
-    
-    width = int(sys.argv[2]) if len(sys.argv) > 2 else 1920
-    height = int(sys.argv[3]) if len(sys.argv) > 3 else 1080
+    device_source = parse_device(args.device)
     
-    result = capture_preview(device_source, width, height)
+    result = capture_preview(device_source, args.width, args.height, output_path=args.output)
     print(json.dumps(result))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,93 +9,155 @@ import os
 import sys
 import json
 import argparse
+import struct
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def detect_cameras(max_index=10):
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# VIDIOC_QUERYCAP = _IOR('V', 0, struct v4l2_capability), 104-byte struct
+VIDIOC_QUERYCAP = 0x80685600
+V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+V4L2_CAP_VIDEO_CAPTURE_MPLANE = 0x00001000
+V4L2_CAP_DEVICE_CAPS = 0x80000000
+
+def _is_capture_device(device_path: str) -> bool:
+    """
+    Check whether a V4L2 node can deliver video frames, without opening it in OpenCV
+    
+    Metadata, ISP statistics and codec nodes report no capture capability and are
+    skipped. Nodes that cannot be queried are kept, so detection never loses a camera.
+    """
+    if fcntl is None:
+        return True
+    try:
+        fd = os.open(device_path, os.O_RDWR | os.O_NONBLOCK)
+    except OSError:
+        return True
+    try:
+        caps = fcntl.ioctl(fd, VIDIOC_QUERYCAP, bytes(104))
+    except OSError:
+        return True
+    finally:
+        os.close(fd)
+    
+    capabilities, device_caps = struct.unpack_from('<II', caps, 84)
+    if capabilities & V4L2_CAP_DEVICE_CAPS:
+        capabilities = device_caps  # Capabilities of this node, not the whole driver
+    return bool(capabilities & (V4L2_CAP_VIDEO_CAPTURE | V4L2_CAP_VIDEO_CAPTURE_MPLANE))
+
+def _probe_one(source, verify_read=True):
+    """
+    Open one camera candidate and describe it
+    
+    Args:
+        source: Device path (str) or device index (int)
+        verify_read: Require a frame to be captured (filters out metadata/ISP nodes)
+        
+    Returns:
+        Camera info dict, or None if the device cannot be opened or read
+    """
+    cap = cv2.VideoCapture(source)
+    try:
+        if not cap.isOpened():
+            return None
+        
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        
+        # Get camera properties
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        
+        # Try to capture a frame to verify it's a real camera
+        if verify_read:
+            ret, _ = cap.read()
+            if not ret:
+                return None
+        
+        if isinstance(source, str):
+            device_path = source
+            device_index = None  # Unknown for path-based detection
+            name = f'Camera at {source}'
+        else:
+            device_path = f'/dev/video{source}' if os.name != 'nt' else None
+            device_index = source
+            name = f'Camera {source}'
+        
+        return {
+            'devicePath': device_path,
+            'deviceIndex': device_index,
+            'name': name,
+            'width': width if width > 0 else None,
+            'height': height if height > 0 else None,
+            'fps': fps if fps > 0 else None,
+            'available': True
+        }
+    finally:
+        cap.release()
+
+def detect_cameras(max_index=10, verify_read=True, max_workers=8):
     """
     Detect available cameras by testing device indices and paths
     
+    Devices are probed concurrently: opening a V4L2 device blocks in the driver
+    (with the GIL released), so probes overlap instead of adding up.
+    
+    Args:
+        max_index: Number of device indices to check
+        verify_read: Require each camera to deliver a frame
+        max_workers: Maximum number of concurrent probes
+    
     Returns:
         List of detected cameras with index, path, and basic info
     """
-    detected = []
+    candidates = []
+    seen_paths = set()
     
     # Method 1: Check /dev/video* devices (Linux/Raspberry Pi)
     if os.name != 'nt':  # Not Windows
-        video_devices = sorted(Path('/dev').glob('video*'))
-        
-        for device_path in video_devices:
+        seen_devices = set()
+        for device_path in sorted(Path('/dev').glob('video*')):
             device_str = str(device_path)
-            
-            # Try to open the camera
-            cap = cv2.VideoCapture(device_str)
-            
-            if cap.isOpened():
-                # Get camera properties
-                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                fps = int(cap.get(cv2.CAP_PROP_FPS))
-                
-                # Try to capture a frame to verify it's a real camera
-                ret, _ = cap.read()
-                
-                if ret:
-                    detected.append({
-                        'devicePath': device_str,
-                        'deviceIndex': None,  # Unknown for path-based detection
-                        'name': f'Camera at {device_str}',
-                        'width': width if width > 0 else None,
-                        'height': height if height > 0 else None,
-                        'fps': fps if fps > 0 else None,
-                        'available': True
-                    })
-                
-                cap.release()
+            seen_paths.add(device_str)
+            try:
+                # Symlinked aliases share the device number of the node they point to
+                rdev = os.stat(device_str).st_rdev
+            except OSError:
+                continue
+            if rdev in seen_devices:
+                continue
+            seen_devices.add(rdev)
+            if _is_capture_device(device_str):
+                candidates.append(device_str)
     
-    # Method 2: Check device indices (cross-platform)
+    # Method 2: Check device indices (cross-platform), skipping indices whose device
+    # path was already probed or ruled out
     for index in range(max_index):
-        cap = cv2.VideoCapture(index)
-        
-        if cap.isOpened():
-            # Get camera properties
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = int(cap.get(cv2.CAP_PROP_FPS))
-            
-            # Try to capture a frame to verify it's a real camera
-            ret, _ = cap.read()
-            
-            if ret:
-                # Check if we already detected this camera via device path
-                device_str = f'/dev/video{index}' if os.name != 'nt' else None
-                already_detected = any(
-                    cam['devicePath'] == device_str for cam in detected
-                ) if device_str else False
-                
-                if not already_detected:
-                    detected.append({
-                        'devicePath': device_str,
-                        'deviceIndex': index,
-                        'name': f'Camera {index}',
-                        'width': width if width > 0 else None,
-                        'height': height if height > 0 else None,
-                        'fps': fps if fps > 0 else None,
-                        'available': True
-                    })
-            
-            cap.release()
+        if f'/dev/video{index}' not in seen_paths:
+            candidates.append(index)
+    
+    if not candidates:
+        return []
     
-    return detected
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(candidates))) as executor:
+        results = executor.map(lambda source: _probe_one(source, verify_read), candidates)
+        return [camera for camera in results if camera is not None]
 
 def main():
     parser = argparse.ArgumentParser(description='Detect available camera devices')
     parser.add_argument('--max-index', type=int, default=10, 
                        help='Maximum device index to check (default: 10)')
+    parser.add_argument('--no-read', action='store_true',
+                       help='Only check that devices open, without capturing a test frame')
     
     args = parser.parse_args()
     
     try:
-        cameras = detect_cameras(args.max_index)
+        cameras = detect_cameras(args.max_index, verify_read=not args.no_read)
         
         result = {
             'success': True,
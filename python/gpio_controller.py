@@ -5,9 +5,15 @@ Controls GPIO pins for consistent lighting during captures
 Supports both simple GPIO and addressable WS2812B LED strips
 """
 
+import os
 import sys
 import argparse
 import json
+import signal
+import socket
+from typing import Dict, List, Optional
+
+from ws281x_buffer import map_led_buffer
 
 try:
     import RPi.GPIO as GPIO
@@ -22,6 +28,11 @@ try:
 except ImportError:
     WS2812_AVAILABLE = False
 
+# Socket served by `gpio_controller.py --daemon`
+DEFAULT_SOCKET_PATH = "/run/shelfeye_gpio.sock"
+# Seconds a daemon connection may sit idle before it is dropped
+CONNECTION_TIMEOUT = 5.0
+
 class LEDStripController:
     """Controller for WS2812B addressable LED strips"""
     def __init__(self, pin: int, num_leds: int = 30, brightness: int = 255):
@@ -36,6 +47,7 @@ class LEDStripController:
         self.num_leds = num_leds
         self.brightness = brightness
         self.strip = None
+        self._led_buf = None
         
         if WS2812_AVAILABLE:
             try:
@@ -53,6 +65,9 @@ class LEDStripController:
             except Exception as e:
                 print(f"Error initializing LED strip: {e}", file=sys.stderr)
                 self.strip = None
+        
+        if self.strip:
+            self._led_buf = map_led_buffer(self.strip, self.num_leds)
     
     def set_all(self, color: tuple = (255, 255, 255)):
         """Set all LEDs to a specific color (R, G, B)"""
@@ -61,8 +76,13 @@ class LEDStripController:
         
         try:
             r, g, b = color
-            for i in range(self.num_leds):
-                self.strip.setPixelColor(i, Color(r, g, b))
+            packed = Color(r, g, b)
+            if self._led_buf is not None:
+                # One vectorised fill of the whole native buffer
+                self._led_buf[:] = packed
+            else:
+                for i in range(self.num_leds):
+                    self.strip.setPixelColor(i, packed)
             self.strip.show()
             return True
         except Exception as e:
@@ -76,24 +96,55 @@ class LEDStripController:
     def turn_off(self):
         """Turn off all LEDs"""
         return self.set_all((0, 0, 0))
+    
+    def release(self):
+        """Turn the strip off and free its native driver (DMA channel, PWM/PCM)"""
+        if not self.strip:
+            return
+        self.turn_off()
+        try:
+            self.strip._cleanup()
+        except Exception as e:
+            print(f"Error releasing LED strip on pin {self.pin}: {e}", file=sys.stderr)
+        self._led_buf = None
+        self.strip = None
 
 class GPIOController:
-    def __init__(self):
-        """Initialize GPIO controller"""
+    def __init__(self, configured_pins: Optional[List[int]] = None):
+        """Initialize GPIO controller
+        
+        Args:
+            configured_pins: Output pins to set up once, up front
+        """
+        # pin -> "out" / "in" for pins already set up by this controller
+        self._configured: Dict[int, str] = {}
+        
         if GPIO_AVAILABLE:
             GPIO.setmode(GPIO.BCM)  # Use BCM pin numbering
             GPIO.setwarnings(False)  # Suppress warnings for already-configured pins
+            
+            if configured_pins:
+                try:
+                    GPIO.setup(list(configured_pins), GPIO.OUT)
+                    self._configured.update((pin, "out") for pin in configured_pins)
+                except Exception as e:
+                    print(f"Error setting up GPIO pins {configured_pins}: {e}", file=sys.stderr)
     
     def setup_pin(self, pin: int, mode: str = "out"):
-        """Setup a GPIO pin for input or output"""
+        """Setup a GPIO pin for input or output (no-op if it is already in that mode)"""
         if not GPIO_AVAILABLE:
             return False
         
+        mode = "out" if mode.lower() == "out" else "in"
+        if self._configured.get(pin) == mode:
+            return True
+        
         try:
-            if mode.lower() == "out":
+            if mode == "out":
                 GPIO.setup(pin, GPIO.OUT)
             else:
                 GPIO.setup(pin, GPIO.IN)
+            self._configured[pin] = mode
             return True
         except Exception as e:
             print(f"Error setting up GPIO pin {pin}: {e}", file=sys.stderr)
@@ -131,42 +182,172 @@ class GPIOController:
             # Don't cleanup - we want pins to maintain state
             pass
 
-def main():
-    parser = argparse.ArgumentParser(description="GPIO Controller for LED light strip and alerts")
-    parser.add_argument("--pin", type=int, required=True, help="GPIO pin number (BCM)")
-    parser.add_argument("--action", choices=["on", "off", "read"], required=True, help="Action to perform")
-    parser.add_argument("--led-count", type=int, default=30, help="Number of LEDs in strip (for WS2812B)")
-    parser.add_argument("--use-ws2812", action="store_true", help="Use WS2812B addressable LED mode")
+def run_action(pin: int, action: str, led_count: int = 30, use_ws2812: bool = False,
+               controller: Optional[GPIOController] = None,
+               strips: Optional[Dict[int, LEDStripController]] = None) -> Dict:
+    """
+    Perform one pin/LED action
     
-    args = parser.parse_args()
+    Args:
+        pin: GPIO pin number (BCM)
+        action: "on", "off" or "read"
+        led_count: Number of LEDs in strip (for WS2812B)
+        use_ws2812: Force WS2812B addressable LED mode
+        controller: GPIO controller to reuse (created if omitted)
+        strips: pin -> LED strip controllers to reuse; new strips are added to it
     
+    Returns:
+        Result dict with success, pin, state and mode
+    """
     # Check if this should use LED strip controller (WS2812B mode)
     # Auto-detect: if WS2812 library is available and action is on/off, use it
-    use_led_strip = args.use_ws2812 or (WS2812_AVAILABLE and args.action in ["on", "off"])
+    use_led_strip = use_ws2812 or (WS2812_AVAILABLE and action in ["on", "off"])
     
-    if use_led_strip and args.action != "read":
+    if use_led_strip and action != "read":
         # Use LED strip controller for addressable LEDs
-        led_strip = LEDStripController(args.pin, args.led_count)
+        led_strip = strips.get(pin) if strips is not None else None
+        if led_strip is None or led_strip.num_leds != led_count:
+            if led_strip is not None:
+                # Same pin and DMA channel: the old driver must go before a new one starts
+                led_strip.release()
+            led_strip = LEDStripController(pin, led_count)
+            if strips is not None:
+                strips[pin] = led_strip
         
-        if args.action == "on":
+        if action == "on":
             success = led_strip.turn_on()
-            result = {"success": success, "pin": args.pin, "state": "HIGH" if success else "UNKNOWN", "mode": "ws2812"}
-        elif args.action == "off":
-            success = led_strip.turn_off()
-            result = {"success": success, "pin": args.pin, "state": "LOW" if success else "UNKNOWN", "mode": "ws2812"}
-    else:
-        # Use simple GPIO controller
+            return {"success": success, "pin": pin, "state": "HIGH" if success else "UNKNOWN", "mode": "ws2812"}
+        success = led_strip.turn_off()
+        return {"success": success, "pin": pin, "state": "LOW" if success else "UNKNOWN", "mode": "ws2812"}
+    
+    # Use simple GPIO controller
+    if controller is None:
         controller = GPIOController()
+    
+    if action == "on":
+        success = controller.set_pin(pin, True)
+        return {"success": success, "pin": pin, "state": "HIGH" if success else "UNKNOWN", "mode": "gpio"}
+    elif action == "off":
+        success = controller.set_pin(pin, False)
+        return {"success": success, "pin": pin, "state": "LOW" if success else "UNKNOWN", "mode": "gpio"}
+    elif action == "read":
+        state = controller.get_pin(pin)
+        return {"success": True, "pin": pin, "state": "HIGH" if state else "LOW", "mode": "gpio"}
+    
+    return {"success": False, "pin": pin, "error": f"Unknown action: {action}"}
+
+def run_daemon(socket_path: str = DEFAULT_SOCKET_PATH):
+    """
+    Serve pin/LED commands on a UNIX socket, keeping GPIO and LED strips initialized
+    
+    Requests are JSON lines, several per connection allowed:
+        {"pin": 18, "action": "on" | "off" | "read", "ledCount": 30, "useWs2812": false}
+    Each gets one JSON line back with the same result as the CLI prints.
+    A connection idle for CONNECTION_TIMEOUT seconds is closed.
+    When started through sudo, the socket is handed to the invoking user.
+    """
+    controller = GPIOController()
+    strips: Dict[int, LEDStripController] = {}
+    
+    # Exit through the finally below on SIGTERM so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(socket_path)
+        os.chmod(socket_path, 0o600)
+        if "SUDO_UID" in os.environ:
+            os.chown(socket_path, int(os.environ["SUDO_UID"]), int(os.environ.get("SUDO_GID", -1)))
+        server.listen(8)
+        print(f"GPIO daemon listening on {socket_path}", file=sys.stderr)
         
-        if args.action == "on":
-            success = controller.set_pin(args.pin, True)
-            result = {"success": success, "pin": args.pin, "state": "HIGH" if success else "UNKNOWN", "mode": "gpio"}
-        elif args.action == "off":
-            success = controller.set_pin(args.pin, False)
-            result = {"success": success, "pin": args.pin, "state": "LOW" if success else "UNKNOWN", "mode": "gpio"}
-        elif args.action == "read":
-            state = controller.get_pin(args.pin)
-            result = {"success": True, "pin": args.pin, "state": "HIGH" if state else "LOW", "mode": "gpio"}
+        while True:
+            conn, _ = server.accept()
+            # Connections are served one at a time, so an idle client must not hold the loop
+            conn.settimeout(CONNECTION_TIMEOUT)
+            with conn, conn.makefile("rw") as stream:
+                try:
+                    for line in stream:
+                        if not line.strip():
+                            continue
+                        try:
+                            request = json.loads(line)
+                            result = run_action(
+                                int(request["pin"]),
+                                request["action"],
+                                int(request.get("ledCount", 30)),
+                                bool(request.get("useWs2812", False)),
+                                controller,
+                                strips,
+                            )
+                        except Exception as e:
+                            result = {"success": False, "error": str(e)}
+                        
+                        stream.write(json.dumps(result) + "\n")
+                        stream.flush()
+                except OSError:
+                    pass  # Client went away or sat idle past CONNECTION_TIMEOUT
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+def send_command(command: Dict, socket_path: str = DEFAULT_SOCKET_PATH,
+                 timeout: float = 2.0) -> Optional[Dict]:
+    """
+    Send one command to a running GPIO daemon
+    
+    Args:
+        command: Request dict, e.g. {"pin": 18, "action": "on"}
+        socket_path: Daemon socket path
+        timeout: Seconds to wait for the daemon
+    
+    Returns:
+        The daemon's result dict, or None if no daemon is reachable
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(socket_path)
+            with client.makefile("rw") as stream:
+                stream.write(json.dumps(command) + "\n")
+                stream.flush()
+                response = stream.readline()
+        return json.loads(response) if response else None
+    except (OSError, ValueError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="GPIO Controller for LED light strip and alerts")
+    parser.add_argument("--pin", type=int, help="GPIO pin number (BCM)")
+    parser.add_argument("--action", choices=["on", "off", "read"], help="Action to perform")
+    parser.add_argument("--led-count", type=int, default=30, help="Number of LEDs in strip (for WS2812B)")
+    parser.add_argument("--use-ws2812", action="store_true", help="Use WS2812B addressable LED mode")
+    parser.add_argument("--daemon", action="store_true", help="Serve commands on a UNIX socket instead of running one action")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help=f"Daemon socket path (default {DEFAULT_SOCKET_PATH})")
+    
+    args = parser.parse_args()
+    
+    if args.daemon:
+        run_daemon(args.socket)
+        return 0
+    
+    if args.pin is None or args.action is None:
+        parser.error("--pin and --action are required unless --daemon is given")
+    
+    # Hand the command to a running daemon if there is one; it owns the strips
+    result = send_command({
+        "pin": args.pin,
+        "action": args.action,
+        "ledCount": args.led_count,
+        "useWs2812": args.use_ws2812,
+    }, args.socket)
+    if result is None:
+        result = run_action(args.pin, args.action, args.led_count, args.use_ws2812)
     
     print(json.dumps(result))
     return 0 if result["success"] else 1
@@ -11,13 +11,18 @@ Uses simplified QR-based detection:
 import cv2
 import sys
 import json
+import time
 import logging
+import threading
 import numpy as np
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Tuple, Optional
 from pathlib import Path
 from datetime import datetime
 
+from gpio_controller import send_command
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -34,6 +39,15 @@ def control_light(pin: int, state: str):
         pin: GPIO pin number
         state: 'on' or 'off'
     """
+    # A running GPIO daemon skips the sudo + interpreter startup per toggle
+    result = send_command({"pin": pin, "action": state})
+    if result is not None:
+        if result.get('success'):
+            logger.info(f"Light strip (GPIO {pin}): {state.upper()}")
+        else:
+            logger.warning(f"Light control failed: {result.get('error', result)}")
+        return
+    
     try:
         script_dir = Path(__file__).parent
         gpio_script = script_dir / "gpio_controller.py"
@@ -54,6 +68,102 @@ def control_light(pin: int, state: str):
         logger.warning(f"Light control error: {e}")
 
 
+class CameraGrabber(threading.Thread):
+    """
+    Keeps one camera open and grabbing so reads get a frame taken after the request
+    
+    V4L2/UVC drivers queue several frames, so a single read right after opening (or
+    after a pause) returns a stale image. The thread keeps draining that queue with
+    grab() and only decodes a frame when a reader is waiting for one.
+    """
+    
+    def __init__(self, device_index: int, resolution: List[int]):
+        super().__init__(name=f"grabber-{device_index}", daemon=True)
+        self.device_index = device_index
+        self.resolution = resolution
+        self.opened: Optional[bool] = None  # None until the open attempt finishes
+        self._cond = threading.Condition()
+        self._stop_requested = False
+        self._waiting = 0
+        self._seq = 0
+        self._frame: Optional[np.ndarray] = None
+    
+    def run(self):
+        cap = cv2.VideoCapture(self.device_index)
+        try:
+            if cap.isOpened():
+                width, height = self.resolution
+                cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+                # Keep the driver queue short (only honored by some backends)
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            
+            with self._cond:
+                self.opened = cap.isOpened()
+                self._cond.notify_all()
+            if not self.opened:
+                return
+            
+            failures = 0
+            while not self._stop_requested:
+                if not cap.grab():
+                    failures += 1
+                    if failures >= 10:
+                        logger.error(f"Camera device {self.device_index}: grab keeps failing, stopping")
+                        break
+                    time.sleep(0.05)
+                    continue
+                failures = 0
+                
+                if self._waiting:
+                    # retrieve() allocates a new array each time, so readers own what they get
+                    ret, frame = cap.retrieve()
+                    with self._cond:
+                        if ret:
+                            self._frame = frame
+                            self._seq += 1
+                        self._cond.notify_all()
+        finally:
+            cap.release()
+            with self._cond:
+                self._stop_requested = True
+                self._cond.notify_all()
+    
+    def read(self, timeout: float = 5.0) -> Optional[np.ndarray]:
+        """
+        Return the first frame grabbed after this call
+        
+        Args:
+            timeout: Seconds to wait for the camera to open and deliver a frame
+            
+        Returns:
+            BGR frame, or None if the camera failed or timed out
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.wait_for(lambda: self.opened is not None, timeout)
+            if not self.opened:
+                return None
+            
+            target = self._seq + 1
+            self._waiting += 1
+            try:
+                self._cond.wait_for(lambda: self._seq >= target or self._stop_requested,
+                                    max(0.0, deadline - time.monotonic()))
+                return self._frame if self._seq >= target else None
+            finally:
+                self._waiting -= 1
+    
+    def stop(self):
+        """Stop grabbing and release the camera"""
+        with self._cond:
+            self._stop_requested = True
+            self._cond.notify_all()
+        if self.is_alive():
+            self.join(timeout=2.0)
+
+
 class SlotProcessor:
     """Process individual tool slots with simplified QR-based detection"""
     
@@ -61,8 +171,17 @@ class SlotProcessor:
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         
-        # Initialize QR decoder
-        self.qr_detector = cv2.QRCodeDetector()
+        # QR decoders are per thread: cameras are processed concurrently and a
+        # QRCodeDetector must not be shared between threads
+        self._local = threading.local()
+    
+    @property
+    def qr_detector(self) -> cv2.QRCodeDetector:
+        """QR decoder for the calling thread, created on first use"""
+        detector = getattr(self._local, 'qr_detector', None)
+        if detector is None:
+            detector = self._local.qr_detector = cv2.QRCodeDetector()
+        return detector
     
     def extract_roi(self, frame: np.ndarray, region_coords: List[List[float]]) -> Optional[np.ndarray]:
         """
@@ -101,28 +220,84 @@ class SlotProcessor:
             logger.error(f"ROI extraction failed: {e}")
             return None
     
+    def slot_rects(self, slots: List[Dict[str, Any]], frame_shape: Tuple[int, ...]) -> np.ndarray:
+        """
+        Bounding rectangles of all slot polygons, computed together
+        
+        Matches extract_roi's bounds (cv2.boundingRect, then clipped to the frame)
+        without converting and measuring each polygon separately.
+        
+        Args:
+            slots: Slot configurations with 'regionCoords'
+            frame_shape: Shape of the frame the slots are cut from
+            
+        Returns:
+            (N, 4) int array of x0, y0, x1, y1 per slot; empty rows have x1 <= x0 or y1 <= y0
+            (including slots with missing or malformed regionCoords)
+        """
+        rects = np.zeros((len(slots), 4), dtype=np.int64)
+        
+        # Validate each polygon on its own so one bad slot can't fail the whole camera
+        polygons: List[Optional[np.ndarray]] = []
+        for slot in slots:
+            polygon = None
+            try:
+                points = np.asarray(slot.get('regionCoords') or [], dtype=np.float64)
+                if points.ndim == 2 and points.shape[0] > 0 and points.shape[1] == 2 \
+                        and np.isfinite(points).all():
+                    polygon = points
+                elif points.size:
+                    logger.warning(f"Slot {slot.get('slotId', slot.get('id'))}: malformed regionCoords")
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Slot {slot.get('slotId', slot.get('id'))}: malformed regionCoords: {e}")
+            polygons.append(polygon)
+        
+        max_points = max((len(p) for p in polygons if p is not None), default=0)
+        if max_points == 0:
+            return rects
+        
+        # Pad shorter polygons with their first point, which leaves min/max unchanged
+        coords = np.zeros((len(slots), max_points, 2), dtype=np.float64)
+        has_points = np.zeros(len(slots), dtype=bool)
+        for i, polygon in enumerate(polygons):
+            if polygon is not None:
+                coords[i, :len(polygon)] = polygon
+                coords[i, len(polygon):] = polygon[0]
+                has_points[i] = True
+        coords = coords.astype(np.int32)
+        
+        # boundingRect is inclusive of the max point, so ends are max + 1
+        start = coords.min(axis=1)
+        end = coords.max(axis=1) + 1
+        frame_size = np.array([frame_shape[1], frame_shape[0]])
+        start_clipped = np.maximum(start, 0)
+        end_clipped = np.minimum(start_clipped + (end - start), frame_size)
+        
+        rects[:, :2] = start_clipped
+        rects[:, 2:] = end_clipped
+        rects[~has_points] = 0
+        return rects
+    
     def decode_qr(self, roi: np.ndarray) -> Optional[str]:
         """
         Decode QR code from ROI
         
         Args:
-            roi: Region of interest image
+            roi: Region of interest image, preferably already grayscale
             
         Returns:
             QR code data or None if not found
         """
         try:
-            # Try multiple preprocessing approaches
-            attempts = [
-                roi,  # Original
-                cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY),  # Grayscale
-            ]
-            
-            for img in attempts:
-                data, bbox, _ = self.qr_detector.detectAndDecode(img)
-                if data and bbox is not None:
-                    logger.debug(f"QR decoded: {data}")
-                    return data
+            # QRCodeDetector works on grayscale internally, so a separate color
+            # attempt would only repeat the same search
+            if len(roi.shape) == 3:
+                roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+            
+            data, bbox, _ = self.qr_detector.detectAndDecode(roi)
+            if data and bbox is not None:
+                logger.debug(f"QR decoded: {data}")
+                return data
             
             return None
             
@@ -182,13 +357,18 @@ class SlotProcessor:
             logger.warning(f"Unknown QR type: {qr_type}")
             return ("ITEM_PRESENT", False, None)
     
-    def process_slot(self, frame: np.ndarray, slot_data: Dict[str, Any]) -> Dict[str, Any]:
+    def process_slot(self, frame: np.ndarray, slot_data: Dict[str, Any],
+                     gray_frame: Optional[np.ndarray] = None,
+                     rect: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """
         Process a single slot using simplified QR detection
         
         Args:
             frame: Camera frame
             slot_data: Slot configuration
+            gray_frame: Grayscale copy of frame, converted once per capture (optional)
+            rect: Slot bounds x0, y0, x1, y1 from slot_rects; derived from
+                regionCoords if omitted
             
         Returns:
             Processing result with status and metrics
@@ -211,7 +391,15 @@ class SlotProcessor:
         
         try:
             # Extract ROI
-            roi = self.extract_roi(frame, region_coords)
+            if rect is not None:
+                x0, y0, x1, y1 = (int(v) for v in rect)
+                if x1 <= x0 or y1 <= y0:
+                    logger.warning("Invalid ROI bounds")
+                    roi = None
+                else:
+                    roi = frame[y0:y1, x0:x1]
+            else:
+                roi = self.extract_roi(frame, region_coords)
             if roi is None:
                 result['error'] = 'Failed to extract ROI'
                 result['status'] = 'ERROR'
@@ -221,8 +409,14 @@ class SlotProcessor:
             roi_path = self.data_dir / f"{slot_name}_last.png"
             cv2.imwrite(str(roi_path), roi)
             
-            # Decode QR
-            qr_data = self.decode_qr(roi)
+            # Decode QR on the matching slice of the grayscale frame
+            if gray_frame is None:
+                gray_roi = roi
+            elif rect is not None:
+                gray_roi = gray_frame[y0:y1, x0:x1]
+            else:
+                gray_roi = self.extract_roi(gray_frame, region_coords)
+            qr_data = self.decode_qr(gray_roi)
             result['qrData'] = qr_data
             
             # Determine status using simplified logic
@@ -246,6 +440,23 @@ class CameraProcessor:
     
     def __init__(self):
         self.slot_processor = SlotProcessor()
+        # device index -> running grabber, reused across process_all calls
+        self._grabbers: Dict[int, CameraGrabber] = {}
+    
+    def _get_grabber(self, device_index: int, resolution: List[int]) -> CameraGrabber:
+        """Start (or reuse) the background grabber for a camera device"""
+        grabber = self._grabbers.get(device_index)
+        if grabber is None:
+            grabber = CameraGrabber(device_index, resolution)
+            grabber.start()
+            self._grabbers[device_index] = grabber
+        return grabber
+    
+    def close(self):
+        """Stop all camera grabbers"""
+        for grabber in self._grabbers.values():
+            grabber.stop()
+        self._grabbers.clear()
     
     def process_camera(self, camera_data: Dict[str, Any], slots: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -281,24 +492,17 @@ class CameraProcessor:
             return result
         
         try:
-            # Open camera
-            cap = cv2.VideoCapture(device_index)
-            if not cap.isOpened():
+            # Capture a frame taken after this point from the camera's grabber
+            grabber = self._get_grabber(device_index, resolution)
+            frame = grabber.read()
+            
+            if not grabber.opened:
                 result['status'] = 'failed'
                 result['errors'].append(f'Cannot open camera device {device_index}')
                 logger.error(f"Camera {camera_id}: Cannot open device")
                 return result
             
-            # Set resolution
-            width, height = resolution
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-            
-            # Capture frame
-            ret, frame = cap.read()
-            cap.release()
-            
-            if not ret or frame is None:
+            if frame is None:
                 result['status'] = 'failed'
                 result['errors'].append('Failed to capture frame')
                 logger.error(f"Camera {camera_id}: Frame capture failed")
@@ -306,9 +510,11 @@ class CameraProcessor:
             
             logger.info(f"Camera {camera_id}: Frame captured ({frame.shape})")
             
-            # Process each slot
-            for slot in slots:
-                slot_result = self.slot_processor.process_slot(frame, slot)
+            # Process each slot; grayscale is converted once for the whole frame
+            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            rects = self.slot_processor.slot_rects(slots, frame.shape)
+            for slot, rect in zip(slots, rects):
+                slot_result = self.slot_processor.process_slot(frame, slot, gray_frame, rect)
                 result['slotResults'].append(slot_result)
                 result['slotsProcessed'] += 1
             
@@ -337,10 +543,16 @@ class CameraProcessor:
         """
         logger.info(f"Starting capture processing for {len(cameras)} cameras")
         
+        # Start opening calibrated cameras now so device setup overlaps the light delay;
+        # grabbers that stopped (failed open, camera unplugged) are retried
+        self._grabbers = {index: grabber for index, grabber in self._grabbers.items() if grabber.is_alive()}
+        for camera in cameras:
+            if camera.get('id') and camera.get('homographyMatrix'):
+                self._get_grabber(camera.get('deviceIndex', 0), camera.get('resolution', [1920, 1080]))
+        
         # Turn on light strip for consistent lighting
         if light_strip_pin:
             control_light(light_strip_pin, "on")
-            import time
             time.sleep(0.5)  # Brief delay to let light stabilize
         
         results = []
@@ -349,16 +561,23 @@ class CameraProcessor:
         total_cameras_failed = 0
         
         try:
+            valid_cameras = []
             for camera in cameras:
-                camera_id = camera.get('id')
-                if not camera_id:
+                if not camera.get('id'):
                     logger.warning("Camera missing 'id' field, skipping")
                     continue
-                camera_slots = slots_by_camera.get(camera_id, [])
-                
-                result = self.process_camera(camera, camera_slots)
-                results.append(result)
-                
+                valid_cameras.append(camera)
+            
+            # Cameras are independent and capture/QR decode mostly run in OpenCV
+            # without the GIL, so process them concurrently (results keep input order)
+            if valid_cameras:
+                with ThreadPoolExecutor(max_workers=min(len(valid_cameras), 8)) as executor:
+                    results = list(executor.map(
+                        lambda camera: self.process_camera(camera, slots_by_camera.get(camera['id'], [])),
+                        valid_cameras
+                    ))
+            
+            for result in results:
                 total_slots += result['slotsProcessed']
                 
                 if result['status'] == 'success':
@@ -403,7 +622,10 @@ def main():
         
         # Process all cameras
         processor = CameraProcessor()
-        results = processor.process_all(cameras, slots_by_camera, light_strip_pin)
+        try:
+            results = processor.process_all(cameras, slots_by_camera, light_strip_pin)
+        finally:
+            processor.close()
         
         # Output results as JSON
         print(json.dumps(results))
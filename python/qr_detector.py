@@ -18,6 +18,7 @@ logger = logging.getLogger(__name__)
 class QRDetector:
     def __init__(self, secret_key: str = "tool_tracker_secret"):
         self.secret_key = secret_key.encode('utf-8')
+        self._cv_detector = None
     
     def detect_qr_codes(self, image: np.ndarray) -> List[Dict]:
         """
@@ -52,42 +53,92 @@ class QRDetector:
         
         return results
     
+    def detect_qr_codes_located(self, image: np.ndarray) -> List[Dict]:
+        """
+        Detect and decode QR codes, keeping where each one was found
+        
+        Lets a caller scan a whole frame once and assign codes to regions afterwards.
+        
+        Returns:
+            List of {'data': decoded QR dict, 'center': (x, y)} in input image pixels,
+            one entry per physical code
+        """
+        results = []
+        
+        try:
+            for processed_img, scale in self._preprocess_image_scaled(image):
+                for qr_code in pyzbar.decode(processed_img):
+                    try:
+                        qr_data = json.loads(qr_code.data.decode('utf-8'))
+                    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                        logger.warning(f"Failed to decode QR data: {e}")
+                        continue
+                    
+                    if not self._validate_qr_data(qr_data):
+                        continue
+                    
+                    # Map the code's center back to input image coordinates
+                    rect = qr_code.rect
+                    center = ((rect.left + rect.width / 2.0) / scale,
+                              (rect.top + rect.height / 2.0) / scale)
+                    
+                    # The same code is usually found in several preprocessed variants
+                    duplicate = any(
+                        r['data'].get('id') == qr_data.get('id')
+                        and abs(r['center'][0] - center[0]) < 20 and abs(r['center'][1] - center[1]) < 20
+                        for r in results
+                    )
+                    if not duplicate:
+                        results.append({'data': qr_data, 'center': center})
+        
+        except Exception as e:
+            logger.error(f"Error detecting QR codes: {e}")
+        
+        return results
+    
     def _preprocess_image(self, image: np.ndarray) -> List[np.ndarray]:
         """
         Apply various preprocessing techniques to improve QR detection
         """
+        return [processed for processed, _ in self._preprocess_image_scaled(image)]
+    
+    def _preprocess_image_scaled(self, image: np.ndarray) -> List[Tuple[np.ndarray, float]]:
+        """
+        Preprocessed variants of the image, each paired with its scale relative to the input
+        """
         processed_images = []
         
         # Convert to grayscale if needed
         if len(image.shape) == 3:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         else:
-            gray = image.copy()
+            # Variants below are all new arrays, so the input is never modified
+            gray = image
         
         # Original grayscale
-        processed_images.append(gray)
+        processed_images.append((gray, 1.0))
         
         # Adaptive thresholding
         adaptive_thresh = cv2.adaptiveThreshold(
             gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
         )
-        processed_images.append(adaptive_thresh)
+        processed_images.append((adaptive_thresh, 1.0))
         
         # Morphological operations to clean up noise
         kernel = np.ones((3,3), np.uint8)
         morph = cv2.morphologyEx(adaptive_thresh, cv2.MORPH_CLOSE, kernel)
-        processed_images.append(morph)
+        processed_images.append((morph, 1.0))
         
         # Gaussian blur to reduce noise
         blurred = cv2.GaussianBlur(gray, (3, 3), 0)
-        processed_images.append(blurred)
+        processed_images.append((blurred, 1.0))
         
         # Try different scales
         for scale in [0.75, 1.5]:
             h, w = gray.shape
             new_h, new_w = int(h * scale), int(w * scale)
             scaled = cv2.resize(gray, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
-            processed_images.append(scaled)
+            processed_images.append((scaled, new_w / w))
         
         return processed_images
     
@@ -150,7 +201,10 @@ class QRDetector:
         results = []
         
         try:
-            detector = cv2.QRCodeDetector()
+            # Built once per QRDetector and reused across calls
+            if self._cv_detector is None:
+                self._cv_detector = cv2.QRCodeDetector()
+            detector = self._cv_detector
             
             # Try to detect and decode multiple QR codes
             retval, decoded_info, points, straight_qrcode = detector.detectAndDecodeMulti(image)
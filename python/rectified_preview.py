@@ -228,7 +228,7 @@ def generate_rectified_preview(
         
         # Encode image as JPEG
         _, buffer = cv2.imencode('.jpg', rectified)
-        image_base64 = base64.b64encode(buffer).decode('utf-8')
+        image_base64 = base64.b64encode(buffer).decode('ascii')
         
         return {
             'ok': True,
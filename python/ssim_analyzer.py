@@ -8,10 +8,47 @@ import numpy as np
 import cv2
 from typing import Tuple, Optional
 import logging
-from skimage.metrics import structural_similarity as ssim
 
 logger = logging.getLogger(__name__)
 
+def _ssim_combine(mu_x, mu_y, box_xx, box_yy, box_xy, pad, cov_norm, c1, c2):
+    """SSIM map + per-channel mean over the cropped region"""
+    crop = (slice(pad, -pad), slice(pad, -pad))
+    mu_x, mu_y = mu_x[crop], mu_y[crop]
+    var_x = cov_norm * (box_xx[crop] - mu_x * mu_x)
+    var_y = cov_norm * (box_yy[crop] - mu_y * mu_y)
+    cov_xy = cov_norm * (box_xy[crop] - mu_x * mu_y)
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * cov_xy + c2)) / \
+               ((mu_x * mu_x + mu_y * mu_y + c1) * (var_x + var_y + c2))
+    return ssim_map.reshape(-1, ssim_map.shape[-1]).mean(axis=0, dtype=np.float64)
+
+def _ssim_stack(x: np.ndarray, y: np.ndarray, win_size: int = 7) -> np.ndarray:
+    """
+    Mean SSIM of each image pair in two (H, W, N) uint8 stacks
+    
+    Same definition as skimage's structural_similarity defaults (uniform window,
+    sample covariance, data range 255, borders cropped), with the N pairs as
+    channels so every box filter covers the whole batch in one call.
+    
+    Returns:
+        (N,) float64 scores
+    """
+    shape = x.shape[:2] + (-1,)
+    x = x.astype(np.float32)
+    y = y.astype(np.float32)
+    
+    def box(z):
+        # Single-channel results come back 2-D; keep everything (H, W, N)
+        return cv2.boxFilter(z, -1, (win_size, win_size), borderType=cv2.BORDER_REFLECT).reshape(shape)
+    
+    return _ssim_combine(
+        box(x), box(y), box(x * x), box(y * y), box(x * y),
+        (win_size - 1) // 2,
+        win_size * win_size / (win_size * win_size - 1.0),
+        (0.01 * 255) ** 2,
+        (0.03 * 255) ** 2,
+    )
+
 class SSIMAnalyzer:
     def __init__(self):
         """Initialize SSIM analyzer"""
@@ -75,8 +112,8 @@ class SSIMAnalyzer:
                 processed_img2 = cv2.resize(processed_img2, 
                                           (processed_img1.shape[1], processed_img1.shape[0]))
             
-            # Calculate SSIM
-            ssim_score, _ = ssim(processed_img1, processed_img2, full=True)
+            # Calculate SSIM (box-filter implementation, same definition as skimage's default)
+            ssim_score = _ssim_stack(processed_img1[:, :, None], processed_img2[:, :, None])[0]
             
             return float(ssim_score)
             
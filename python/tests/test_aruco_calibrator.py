@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Corner marker detection across paper sizes
+Renders a synthetic 1080p frame with the A4 calibration sheet at several distances
+and checks that all four corner markers are found.
+
+Run with: python -m unittest discover -s python/tests
+"""
+
+import os
+import sys
+import logging
+import unittest
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aruco_calibrator import ArucoCornerCalibrator, A4_PAPER_SIZE_CM, MARKER_SIZE_CM
+
+FRAME_SIZE = (1920, 1080)
+
+
+def render_sheet(paper_width_px: int, background: int, inset_cm: float = 0.0,
+                 blurred: bool = False, seed: int = 0) -> np.ndarray:
+    """
+    Render the calibration sheet centered in a 1080p BGR frame
+
+    Args:
+        paper_width_px: Width of the A4 landscape sheet in the frame
+        background: Gray level around the sheet
+        inset_cm: Gap between the markers and the paper edges
+        blurred: Apply a sigma 1.5 blur plus sensor noise
+        seed: Noise seed
+    """
+    paper_w_cm, paper_h_cm = A4_PAPER_SIZE_CM
+    px_per_cm = paper_width_px / paper_w_cm
+    paper_h = int(round(paper_h_cm * px_per_cm))
+    marker = int(round(MARKER_SIZE_CM * px_per_cm))
+    inset = int(round(inset_cm * px_per_cm))
+
+    width, height = FRAME_SIZE
+    frame = np.full((height, width, 3), background, dtype=np.uint8)
+    x0 = (width - paper_width_px) // 2
+    y0 = (height - paper_h) // 2
+    frame[y0:y0 + paper_h, x0:x0 + paper_width_px] = 235
+
+    near, far_x, far_y = inset, paper_width_px - marker - inset, paper_h - marker - inset
+    aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_100)
+    for marker_id, (dx, dy) in zip([17, 18, 19, 20], [(near, near), (far_x, near), (far_x, far_y), (near, far_y)]):
+        image = cv2.aruco.generateImageMarker(aruco_dict, marker_id, marker)
+        x, y = x0 + dx, y0 + dy
+        frame[y:y + marker, x:x + marker] = np.where(image[..., None] > 0, 235, 20)
+
+    if blurred:
+        rng = np.random.default_rng(seed)
+        frame = cv2.GaussianBlur(frame, (0, 0), 1.5)
+        frame = np.clip(frame + rng.normal(0, 4, frame.shape), 0, 255).astype(np.uint8)
+    return frame
+
+
+class CornerMarkerDetectionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+        cls.calibrator = ArucoCornerCalibrator()
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def assert_all_found(self, widths, **sheet):
+        for paper_width in widths:
+            with self.subTest(paper_width=paper_width, **sheet):
+                _, num_detected, _ = self.calibrator.detect_corner_markers(render_sheet(paper_width, **sheet))
+                self.assertEqual(num_detected, 4)
+
+    def test_sharp_flush_markers(self):
+        # Markers printed flush with the paper edges, on a mid-gray shelf
+        self.assert_all_found((1400, 1100, 800, 600, 500), background=120)
+
+    def test_blurred_markers_with_margin(self):
+        # Printer margin around the markers, dark shelf, defocused camera
+        self.assert_all_found((1400, 1100, 800, 600, 500, 400), background=70, inset_cm=0.3, blurred=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
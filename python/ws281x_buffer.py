@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Direct access to the native LED buffer of an rpi_ws281x strip
+Shared by the GPIO and alert LED controllers
+"""
+
+import sys
+import ctypes
+
+def map_led_buffer(strip, num_leds: int):
+    """
+    Map a started PixelStrip's native LED buffer as a writable uint32 array
+
+    Each element is a packed 0x00RRGGBB color, so `buf[:] = color` sets the
+    whole strip in one write before strip.show(). numpy and the low-level
+    bindings are only imported here, once a strip actually exists.
+
+    Args:
+        strip: PixelStrip after begin()
+        num_leds: Number of LEDs in the strip
+
+    Returns:
+        (num_leds,) uint32 view of the buffer, or None if it can't be mapped
+    """
+    try:
+        import numpy as np
+        import _rpi_ws281x as ws
+
+        channel = ws.ws2811_channel_get(strip._leds, 0)
+        led_data = ws.ws2811_channel_t_leds_get(channel)
+        raw = (ctypes.c_uint32 * num_leds).from_address(int(led_data))
+        return np.frombuffer(raw, dtype=np.uint32)
+    except Exception as e:
+        print(f"LED buffer mapping unavailable, using per-pixel writes: {e}", file=sys.stderr)
+        return None
@@ -64,7 +64,6 @@ echo "This may take 5-10 minutes on Raspberry Pi..."
 pip3 install --break-system-packages \
     opencv-contrib-python-headless \
     pyzbar \
-    scikit-image \
     numpy
 
 echo -e "${GREEN}✓ Python CV packages installed${NC}"